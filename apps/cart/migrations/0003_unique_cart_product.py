@@ -0,0 +1,42 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:23
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def dedupe_cart_items(apps, schema_editor):
+    # Deja solo el item mas reciente de cada (carrito, producto) antes de crear la restriccion
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(rows=Count('id'), keep=Max('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    cart_ids = set()
+    for row in duplicates:
+        CartItem.objects.filter(
+            cart_id=row['cart_id'], product_id=row['product_id'],
+        ).exclude(id=row['keep']).delete()
+        cart_ids.add(row['cart_id'])
+
+    for cart in Cart.objects.filter(id__in=cart_ids):
+        cart.total_items = CartItem.objects.filter(cart_id=cart.id).count()
+        cart.save(update_fields=['total_items'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_cart_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -7,9 +7,18 @@ User = settings.AUTH_USER_MODEL
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     total_items = models.IntegerField(default=0)
+    # Sube en cada cambio del carrito; se expone como ETag
+    version = models.PositiveIntegerField(default=0)
 
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    count = models.IntegerField()
\ No newline at end of file
+    count = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            # Permite sincronizar el carrito con un upsert
+            models.UniqueConstraint(
+                fields=['cart', 'product'], name='unique_cart_product'),
+        ]
\ No newline at end of file
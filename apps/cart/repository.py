@@ -0,0 +1,24 @@
+from apps.product.serializers import ProductSerializer
+from .models import CartItem
+
+
+def get_cart_items(user, ordering='id'):
+    # Un solo query: items del carrito con su producto y el carrito (JOIN)
+    return list(
+        CartItem.objects.filter(cart__user=user)
+        .select_related('product', 'cart')
+        .order_by(ordering)
+    )
+
+
+def serialize_cart_items(cart_items):
+    products = ProductSerializer(
+        [cart_item.product for cart_item in cart_items], many=True).data
+    return [
+        {'id': cart_item.id, 'count': cart_item.count, 'product': product}
+        for cart_item, product in zip(cart_items, products)
+    ]
+
+
+def get_cart_total(cart_items):
+    return sum(cart_item.product.price * cart_item.count for cart_item in cart_items)
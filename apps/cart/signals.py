@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.product.models import Product
+from .models import CartItem
+from .snapshot import invalidate_product_carts
+from .versions import is_changing, touch_cart
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def bump_changed_cart(sender, instance, **kwargs):
+    # Cambios hechos fuera del codigo del carrito: admin, o el borrado en cascada
+    # de un producto (post_delete de Product llega despues de borrar sus CartItem)
+    if not is_changing(instance.cart_id):
+        touch_cart(instance.cart_id)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_carts(sender, instance, created, **kwargs):
+    # El snapshot guarda el producto serializado (precio, stock, etc.)
+    if not created:
+        invalidate_product_carts([instance.pk])
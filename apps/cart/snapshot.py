@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from core.caching import invalidated_timeout
+
+from .models import Cart
+from .repository import get_cart_items, get_cart_total, serialize_cart_items
+
+# Lo maximo que un snapshot puede quedar desactualizado por un cambio de producto
+SNAPSHOT_TIMEOUT = 60 * 5
+
+
+def snapshot_key(user_id, version):
+    return f'cart:snapshot:{user_id}:{version}'
+
+
+def build_cart_snapshot(user):
+    cart_items = get_cart_items(user)
+    items = serialize_cart_items(cart_items)
+    for item, cart_item in zip(items, cart_items):
+        item['line_price'] = cart_item.product.price * cart_item.count
+
+    if cart_items:
+        version = cart_items[0].cart.version
+    else:
+        version = Cart.objects.filter(user=user).values_list('version', flat=True).first()
+
+    return {
+        'version': version,
+        'items': items,
+        'total_items': len(cart_items),
+        'item_count': sum(cart_item.count for cart_item in cart_items),
+        'total_cost': get_cart_total(cart_items),
+    }
+
+
+def cart_version(user):
+    return Cart.objects.filter(user=user).values_list('version', flat=True).first()
+
+
+def get_cart_snapshot(user):
+    # La version es parte de la clave: cada cambio del carrito la sube, asi que ningun
+    # worker sirve un snapshot viejo, aunque lo haya guardado una lectura anterior al commit
+    key = snapshot_key(user.id, cart_version(user))
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_cart_snapshot(user)
+        cache.set(key, snapshot, invalidated_timeout(SNAPSHOT_TIMEOUT))
+    return snapshot
+
+
+def invalidate_product_carts(product_ids):
+    """Drop the snapshots of the carts holding ``product_ids`` once the transaction commits.
+
+    For product changes (price, stock, rating), which do not bump the cart version.
+    """
+    def delete():
+        keys = [
+            snapshot_key(user_id, version)
+            for user_id, version in Cart.objects.filter(
+                cartitem__product_id__in=product_ids).values_list('user_id', 'version').distinct()
+        ]
+        if keys:
+            cache.delete_many(keys)
+    transaction.on_commit(delete)
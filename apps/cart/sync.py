@@ -0,0 +1,52 @@
+from django.db.models import F
+
+from apps.product.models import Product
+from .models import Cart, CartItem
+from .versions import bump_cart, cart_change
+
+
+def sync_cart(cart_id, counts, expected=None):
+    """Merge ``counts`` ({product_id: count}) into the cart and return the new cart version.
+
+    Counts are clamped to the available stock; lines that end up below 1 are removed
+    from the cart (e.g. the product ran out of stock) and products that no longer
+    exist are skipped. The number of queries does not depend on how many lines are merged.
+    """
+    stock = dict(
+        Product.objects.filter(id__in=counts).values_list('id', 'quantity'))
+
+    items = []
+    emptied = []
+    for product_id, count in counts.items():
+        if product_id not in stock:
+            # Un carrito de invitado puede traer productos borrados desde entonces
+            continue
+        count = min(count, stock[product_id])
+        if count > 0:
+            items.append(CartItem(cart_id=cart_id, product_id=product_id, count=count))
+        else:
+            emptied.append(product_id)
+
+    with cart_change(cart_id):
+        # Bloquea el carrito primero para que el conteo de items nuevos sea exacto
+        version = bump_cart(cart_id, expected)
+        existing = set(
+            CartItem.objects.filter(cart_id=cart_id, product_id__in=counts)
+            .values_list('product_id', flat=True)
+        )
+        CartItem.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['count'],
+        )
+        removed = 0
+        if emptied:
+            # Una linea existente sin stock no puede quedar con su cantidad vieja
+            removed, _ = CartItem.objects.filter(
+                cart_id=cart_id, product_id__in=emptied).delete()
+        added = sum(1 for item in items if item.product_id not in existing)
+        if added != removed:
+            Cart.objects.filter(pk=cart_id).update(
+                total_items=F('total_items') + added - removed)
+    return version
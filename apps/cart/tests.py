@@ -1,3 +1,228 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.category.models import Category
+from apps.product.models import Product
+from .models import Cart, CartItem
+from .versions import cart_etag
+
+# Lectura sin snapshot en cache: version del carrito + items con sus productos (JOIN)
+COLD_READ_QUERIES = 2
+# Con el snapshot en cache solo se lee la version del carrito
+WARM_READ_QUERIES = 1
+
+
+class CartReadQueriesTest(TestCase):
+    """Cart reads run the same number of queries for 1 and for 50 items."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='cart@example.com', password='password', first_name='Cart', last_name='Test')
+        category = Category.objects.create(name='Cart')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Product {index}', description='Product', price=10 + index,
+                    compare_price=100, category=category, quantity=10)
+            for index in range(50)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, size):
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product=product, count=2) for product in self.products[:size]])
+        Cart.objects.filter(pk=cart.pk).update(total_items=size)
+        cache.clear()
+
+    def assert_read_queries(self, url, size):
+        self.fill_cart(size)
+        with self.assertNumQueries(COLD_READ_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_get_items(self):
+        for size in (1, 50):
+            with self.subTest(size=size):
+                response = self.assert_read_queries('/api/cart/cart-items', size)
+                self.assertEqual(len(response.data['products']), size)
+                CartItem.objects.all().delete()
+
+    def test_get_total(self):
+        for size in (1, 50):
+            with self.subTest(size=size):
+                response = self.assert_read_queries('/api/cart/total', size)
+                self.assertEqual(
+                    response.data['total_cost'],
+                    sum(product.price * 2 for product in self.products[:size]))
+                CartItem.objects.all().delete()
+
+    def test_get_item_total(self):
+        for size in (1, 50):
+            with self.subTest(size=size):
+                response = self.assert_read_queries('/api/cart/total-items', size)
+                self.assertEqual(response.data['total_items'], size)
+                CartItem.objects.all().delete()
+
+    def test_cached_reads(self):
+        for size in (1, 50):
+            with self.subTest(size=size):
+                self.assert_read_queries('/api/cart/cart-items', size)
+                for url in ('/api/cart/cart-items', '/api/cart/total', '/api/cart/total-items'):
+                    with self.assertNumQueries(WARM_READ_QUERIES):
+                        self.assertEqual(self.client.get(url).status_code, 200)
+                CartItem.objects.all().delete()
+
+    def test_change_is_seen_without_delete(self):
+        # Otro worker no ve el delete: el snapshot nuevo sale de la version nueva
+        self.fill_cart(1)
+        self.assertEqual(self.client.get('/api/cart/total-items').data['total_items'], 1)
+        response = self.client.post(
+            '/api/cart/add-item', {'product_id': self.products[1].id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/cart/total-items').data['total_items'], 2)
+
+    def test_writes_outside_the_cart_views(self):
+        # Admin y borrados en cascada no pasan por bump_cart: la version sube igual
+        self.fill_cart(2)
+        item = CartItem.objects.get(product=self.products[0])
+        self.assertEqual(self.client.get('/api/cart/total').data['total_cost'],
+                         self.products[0].price * 2 + self.products[1].price * 2)
+
+        item.count = 5
+        item.save()
+        self.assertEqual(self.client.get('/api/cart/total').data['total_cost'],
+                         self.products[0].price * 5 + self.products[1].price * 2)
+
+        item.delete()
+        self.assertEqual(self.client.get('/api/cart/total').data['total_cost'],
+                         self.products[1].price * 2)
+
+        Product.objects.filter(pk=self.products[1].pk).delete()
+        self.assertEqual(self.client.get('/api/cart/cart-items').data['products'], [])
+
+    def test_cart_views_bump_once(self):
+        self.fill_cart(1)
+        cart = Cart.objects.get(user=self.user)
+        response = self.client.post(
+            '/api/cart/add-item', {'product_id': self.products[1].id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.get(pk=cart.pk).version, cart.version + 1)
+
+
+class CartPreconditionTest(TestCase):
+    """Cart writes honour ``If-Match`` and cart reads ``If-None-Match``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='etag@example.com', password='password', first_name='Etag', last_name='Test')
+        category = Category.objects.create(name='Etag')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Product {index}', description='Product', price=10,
+                    compare_price=20, category=category, quantity=10)
+            for index in range(3)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.add(self.products[0])
+        self.etag = self.client.get('/api/cart/cart-items')['ETag']
+
+    def add(self, product, **headers):
+        return self.client.post(
+            '/api/cart/add-item', {'product_id': product.id}, format='json', headers=headers)
+
+    def current_etag(self):
+        return cart_etag(Cart.objects.get(user=self.user).version)
+
+    def test_stale_if_match(self):
+        # Otro cliente cambia el carrito despues de leerlo
+        self.add(self.products[1])
+        writes = [
+            lambda headers: self.add(self.products[2], **headers),
+            lambda headers: self.client.put(
+                '/api/cart/update-item', {'product_id': self.products[0].id, 'count': 3},
+                format='json', headers=headers),
+            lambda headers: self.client.delete(
+                f'/api/cart/remove-item/{self.products[0].id}', headers=headers),
+            lambda headers: self.client.delete('/api/cart/empty-cart', headers=headers),
+            lambda headers: self.client.put(
+                '/api/cart/SyncCart',
+                {'cart_items': [{'product': {'id': self.products[2].id}, 'count': 1}]},
+                format='json', headers=headers),
+        ]
+        for index, write in enumerate(writes):
+            with self.subTest(write=index):
+                current = self.current_etag()
+                response = write({'If-Match': self.etag})
+                self.assertEqual(response.status_code, 412)
+                self.assertEqual(response['ETag'], current)
+                self.assertEqual(self.current_etag(), current)
+                self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 2)
+
+    def test_retry_with_the_current_etag(self):
+        self.add(self.products[1])
+        response = self.add(self.products[2], **{'If-Match': self.etag})
+        self.assertEqual(response.status_code, 412)
+        response = self.add(self.products[2], **{'If-Match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.current_etag())
+
+    def test_if_none_match(self):
+        response = self.client.get('/api/cart/total', headers={'If-None-Match': self.etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+
+        self.add(self.products[1])
+        response = self.client.get('/api/cart/total', headers={'If-None-Match': self.etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.current_etag())
+
+
+class CartSyncTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='sync@example.com', password='password', first_name='Sync', last_name='Test')
+        category = Category.objects.create(name='Sync')
+        cls.kept, cls.sold_out, cls.added, cls.untouched = Product.objects.bulk_create([
+            Product(name=f'Product {index}', description='Product', price=10,
+                    compare_price=20, category=category, quantity=quantity)
+            for index, quantity in enumerate((10, 0, 5, 10))
+        ])
+        cls.cart = Cart.objects.get(user=cls.user)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cls.cart, product=product, count=2)
+            for product in (cls.kept, cls.sold_out, cls.untouched)
+        ])
+        Cart.objects.filter(pk=cls.cart.pk).update(total_items=3)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_sync(self):
+        version = Cart.objects.get(pk=self.cart.pk).version
+        missing = max(self.kept.id, self.sold_out.id, self.added.id, self.untouched.id) + 1
+        response = self.client.put('/api/cart/SyncCart', {'cart_items': [
+            {'product': {'id': self.kept.id}, 'count': 50},
+            {'product': {'id': self.sold_out.id}, 'count': 1},
+            {'product': {'id': self.added.id}, 'count': 3},
+            {'product': {'id': missing}, 'count': 1},
+        ]}, format='json', headers={'If-Match': cart_etag(version)})
+        self.assertEqual(response.status_code, 201)
+
+        cart = Cart.objects.get(pk=self.cart.pk)
+        self.assertEqual(cart.version, version + 1)
+        self.assertEqual(response['ETag'], cart_etag(cart.version))
+        self.assertEqual(
+            dict(CartItem.objects.filter(cart=cart).values_list('product_id', 'count')),
+            {self.kept.id: 10, self.added.id: 3, self.untouched.id: 2})
+        self.assertEqual(cart.total_items, 3)
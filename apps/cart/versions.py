@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F
+from django.utils.http import parse_etags, quote_etag
+
+from .models import Cart
+
+# Carritos cuyo codigo en curso sube la version por su cuenta (bump_cart)
+_changing = ContextVar('changing_carts', default=frozenset())
+
+
+class CartVersionConflict(Exception):
+    pass
+
+
+@contextmanager
+def cart_change(cart_id, atomic=True):
+    """Transaction for CartItem writes whose cart version the caller bumps with ``bump_cart``.
+
+    Any other CartItem write (admin, a product deleted in cascade) bumps the
+    version from the ``apps.cart.signals`` receivers instead. With ``atomic=False``
+    the writes rely on a transaction the caller already holds (checkout, wishlist).
+    """
+    token = _changing.set(_changing.get() | {cart_id})
+    try:
+        if atomic:
+            with transaction.atomic():
+                yield
+        else:
+            yield
+    finally:
+        _changing.reset(token)
+
+
+def is_changing(cart_id):
+    return cart_id in _changing.get()
+
+
+def touch_cart(cart_id):
+    # Nueva version = nueva clave de snapshot y nueva ETag, en todos los workers
+    Cart.objects.filter(pk=cart_id).update(version=F('version') + 1)
+
+
+def cart_etag(version):
+    return quote_etag(f'cart-{version}')
+
+
+def matches_etag(header, version):
+    # Acepta ETags debiles, como los que reenvian algunos proxies
+    etag = cart_etag(version)
+    return any(tag == etag or tag == 'W/' + etag for tag in parse_etags(header or ''))
+
+
+def expected_version(request):
+    """The cart version sent in ``If-Match``, None when there is no precondition, -1 when it is not a cart ETag."""
+    header = request.headers.get('If-Match')
+    if not header:
+        return None
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return None
+    for etag in etags:
+        tag = etag.strip('"')
+        if tag.startswith('cart-') and tag[len('cart-'):].isdigit():
+            return int(tag[len('cart-'):])
+    return -1
+
+
+def bump_cart(cart_id, expected=None, items_delta=0, total_items=None):
+    """Apply a cart change with F() expressions and return the new version.
+
+    Raises CartVersionConflict when ``expected`` is given and the cart is at another version.
+    """
+    updates = {'version': F('version') + 1}
+    if total_items is not None:
+        updates['total_items'] = total_items
+    elif items_delta:
+        updates['total_items'] = F('total_items') + items_delta
+
+    carts = Cart.objects.filter(pk=cart_id)
+    if expected is not None:
+        carts = carts.filter(version=expected)
+
+    # Siempre dentro de la transaccion del llamador (cart_change, checkout): sin savepoint
+    with transaction.atomic(savepoint=False):
+        if not carts.update(**updates):
+            raise CartVersionConflict()
+        if expected is not None:
+            return expected + 1
+        # La fila queda bloqueada hasta el commit, nadie mas la cambia entre medio
+        return Cart.objects.filter(pk=cart_id).values_list('version', flat=True).get()
@@ -1,13 +1,41 @@
+from django.db.models import F
 from rest_framework.response import Response
 from rest_framework import status
 from core.views import AuthenticatedAPIView
 from .models import Cart, CartItem
 from apps.product.models import Product
-from apps.product.serializers import ProductSerializer
 from apps.wishlist.models import WishList, WishListItem
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from .Serializers import CartItemsResponseSerializer
+from .repository import get_cart_items, serialize_cart_items
+from .snapshot import get_cart_snapshot
+from .sync import sync_cart
+from .versions import CartVersionConflict, bump_cart, cart_change, cart_etag, expected_version, matches_etag
+
+
+def snapshot_response(request, snapshot, data):
+    # GET condicional: si el cliente ya tiene esta version no se reenvia el cuerpo
+    if matches_etag(request.headers.get('If-None-Match'), snapshot['version']):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    response['ETag'] = cart_etag(snapshot['version'])
+    return response
+
+
+def versioned_response(data, version, status_code=status.HTTP_200_OK):
+    response = Response(data, status=status_code)
+    response['ETag'] = cart_etag(version)
+    return response
+
+
+def version_conflict_response(cart_id):
+    # La ETag actual deja al cliente reintentar sin volver a leer el carrito
+    version = Cart.objects.filter(pk=cart_id).values_list('version', flat=True).get()
+    return versioned_response(
+        {'error': 'The cart was modified by another request'},
+        version, status.HTTP_412_PRECONDITION_FAILED)
 
 
 class GetItemsView(AuthenticatedAPIView):
@@ -23,24 +51,10 @@ class GetItemsView(AuthenticatedAPIView):
     def get(self, request, format=None):
         user = request.user
         try:
-            cart = Cart.objects.get(user=user)
-            cart_items = CartItem.objects.filter(cart=cart)
-            result = []
-            if cart_items.exists():
-                for cart_item in cart_items:
-                    item = {}
-                    item['id'] = cart_item.pk
-                    item['count'] = cart_item.count
-                    product = Product.objects.get(id=cart_item.product.id)
-                    product = ProductSerializer(product)
+            snapshot = get_cart_snapshot(user)
 
-                    item['product'] = product.data
-
-                    result.append(item)
-
-            return Response(
-                {'products': result},
-                status=status.HTTP_200_OK)
+            return snapshot_response(
+                request, snapshot, {'products': snapshot['items']})
 
         except:
             return Response(
@@ -133,31 +147,30 @@ class AddItemsView(AuthenticatedAPIView):
                     {'error': 'Item is already in cart'},
                     status=status.HTTP_409_CONFLICT)
             if int(product.quantity) > 0:
-                CartItem.objects.create(
-                    product=product, cart=user_cart, count=1
-                )
-                total_items = int(user_cart.total_items)+1
-                Cart.objects.filter(user=user).update(
-                    total_items=total_items
-                )
-                wishlist = WishList.objects.get(user=user)
-                if WishListItem.objects.filter(wishlist=wishlist, product=product).exists():
-                    WishListItem.objects.filter(
-                        wishlist=wishlist, product=product).delete()
-                    total_items = int(wishlist.total_items)-1
-                    WishList.objects.filter(user=user).update(
-                        total_items=total_items
+                with cart_change(user_cart.id):
+                    version = bump_cart(
+                        user_cart.id, expected_version(request), items_delta=1)
+                    CartItem.objects.create(
+                        product=product, cart=user_cart, count=1
                     )
-
-                return Response(
+                    deleted, _ = WishListItem.objects.filter(
+                        wishlist__user=user, product=product).delete()
+                    if deleted:
+                        WishList.objects.filter(user=user).update(
+                            total_items=F('total_items') - deleted
+                        )
+
+                return versioned_response(
                     {'message': 'Product successfully added to your cart'},
-                    status=status.HTTP_200_OK)
+                    version)
 
             else:
                 return Response(
                     {'error': 'Not enough of this item in stock'},
                     status=status.HTTP_409_CONFLICT)
 
+        except CartVersionConflict:
+            return version_conflict_response(user_cart.id)
         except:
 
             return Response(
@@ -188,18 +201,10 @@ class GetTotalView(AuthenticatedAPIView):
 
         try:
 
-            user_cart = Cart.objects.get(user=user)
-            cart_items = CartItem.objects.filter(cart=user_cart)
-            total = 0
-
-            if cart_items.exists():
-                for cart_item in cart_items:
-                    n = cart_item.count
-                    price = cart_item.product.price
-                    total += price*n
-            return Response(
-                {'total_cost': total},
-                status=status.HTTP_200_OK)
+            snapshot = get_cart_snapshot(user)
+
+            return snapshot_response(
+                request, snapshot, {'total_cost': snapshot['total_cost']})
         except Exception as e:
             print(e)
             return Response(
@@ -228,11 +233,10 @@ class GetItemsTotalView(AuthenticatedAPIView):
     def get(self, request, format=None):
         user = request.user
         try:
-            user_cart = Cart.objects.get(user=user)
+            snapshot = get_cart_snapshot(user)
 
-            return Response(
-                {'total_items': user_cart.total_items},
-                status=status.HTTP_200_OK)
+            return snapshot_response(
+                request, snapshot, {'total_items': snapshot['total_items']})
         except Exception as e:
             return Response(
                 {'error': 'Something went wrong when retrieving cart items'},
@@ -304,32 +308,24 @@ class UpdateItemView(AuthenticatedAPIView):
             stock = product.quantity
 
             if stock >= count:
-                CartItem.objects.filter(
-                    product=product, cart=user_cart
-                ).update(count=count)
-
-                cart_items = CartItem.objects.order_by(
-                    'product').filter(cart=user_cart)
-                result = []
-
-                for cart_item in cart_items:
-                    item = {}
-                    item['id'] = cart_item.id
-                    item['count'] = cart_item.count
-
-                    product = Product.objects.get(id=cart_item.product.id)
-                    product = ProductSerializer(product)
-                    item['product'] = product.data
+                with cart_change(user_cart.id):
+                    version = bump_cart(user_cart.id, expected_version(request))
+                    CartItem.objects.filter(
+                        product=product, cart=user_cart
+                    ).update(count=count)
 
-                    result.append(item)
+                result = serialize_cart_items(
+                    get_cart_items(user, ordering='product'))
 
-                return Response({'cart': result}, status=status.HTTP_200_OK)
+                return versioned_response({'cart': result}, version)
 
             else:
                 return Response(
                     {'error': 'Not enough of this item in stock'},
                     status=status.HTTP_403_FORBIDDEN)
 
+        except CartVersionConflict:
+            return version_conflict_response(user_cart.id)
         except:
 
             return Response(
@@ -381,30 +377,19 @@ class RemoveItemView(AuthenticatedAPIView):
                     {'error': 'This product is not in your cart'},
                     status=status.HTTP_404_NOT_FOUND)
 
-            CartItem.objects.filter(cart=user_cart, product=product).delete()
-
-            if not CartItem.objects.filter(cart=user_cart, product=product).exists():
-                total_items = int(user_cart.total_items) - 1
-                Cart.objects.filter(user=user).update(total_items=total_items)
+            with cart_change(user_cart.id):
+                deleted, _ = CartItem.objects.filter(
+                    cart=user_cart, product=product).delete()
+                version = bump_cart(
+                    user_cart.id, expected_version(request), items_delta=-deleted)
 
-            cart_items = CartItem.objects.order_by(
-                'product').filter(cart=user_cart)
-            result = []
+            result = serialize_cart_items(
+                get_cart_items(user, ordering='product'))
 
-            if CartItem.objects.filter(cart=user_cart).exists():
-                for cart_item in cart_items:
-                    item = {}
-                    item['id'] = cart_item.id
-                    item['count'] = cart_item.count
-
-                    product = Product.objects.get(id=cart_item.product.id)
-                    product = ProductSerializer(product)
-                    item['product'] = product.data
-
-                    result.append(item)
-
-            return Response({'cart': result}, status=status.HTTP_200_OK)
+            return versioned_response({'cart': result}, version)
 
+        except CartVersionConflict:
+            return version_conflict_response(user_cart.id)
         except:
             return Response(
                 {'error': 'Something went wrong when retrieving cart items'},
@@ -442,19 +427,22 @@ class EmptyCartView(AuthenticatedAPIView):
         user = request.user
 
         try:
-            if Cart.objects.get(user=user).total_items == 0:
+            user_cart = Cart.objects.get(user=user)
+            if user_cart.total_items == 0:
                 return Response(
                     {'error': 'Your cart is already empty'},
                     status=status.HTTP_409_CONFLICT)
-            user_cart = Cart.objects.get(user=user)
 
-            CartItem.objects.filter(cart=user_cart).delete()
-            Cart.objects.filter(user=user).update(total_items=0)
+            with cart_change(user_cart.id):
+                version = bump_cart(
+                    user_cart.id, expected_version(request), total_items=0)
+                CartItem.objects.filter(cart=user_cart).delete()
 
-            return Response(
-                {'success': 'Cart emptied successfully'},
-                status=status.HTTP_200_OK)
+            return versioned_response(
+                {'success': 'Cart emptied successfully'}, version)
 
+        except CartVersionConflict:
+            return version_conflict_response(user_cart.id)
         except:
             return Response(
                 {'error': 'Something went wrong when retrieving cart items'},
@@ -464,7 +452,7 @@ class EmptyCartView(AuthenticatedAPIView):
 class SyncCartView(AuthenticatedAPIView):
 
     @extend_schema(
-        description="Synchronize the user cart with the provided data",
+        description="Merge the provided items into the user cart (e.g. a guest cart after login). Counts are clamped to stock, items not yet in the cart are added, items left with no stock are removed and unknown products are skipped.",
         responses={
             201: {
 
@@ -482,7 +470,7 @@ class SyncCartView(AuthenticatedAPIView):
                 "properties": {
                     "error": {"type": "string"}
                 },
-                "example": {"error": "Product with this ID does not exist"}
+                "example": {"error": "Product ID must be an integer"}
 
             },
             **AuthenticatedAPIView.get_500_errors(),
@@ -492,41 +480,36 @@ class SyncCartView(AuthenticatedAPIView):
         user = request.user
         data = request.data
 
+        counts = {}
         try:
-            user_cart = Cart.objects.get(user=user)
-            cart_items = data['cart_items']
-
-            for item in cart_items:
+            for item in data['cart_items']:
                 try:
                     product_id = int(item["product"]["id"])
-
                 except:
                     return Response(
                         {'error': 'Product ID must be an integer'},
                         status=status.HTTP_404_NOT_FOUND)
-
-                if not Product.objects.filter(id=product_id).exists():
+                try:
+                    counts[product_id] = int(item["count"])
+                except:
                     return Response(
-                        {'error': 'Product with this ID does not exist'},
+                        {'error': 'Count must be an integer'},
                         status=status.HTTP_404_NOT_FOUND)
+        except:
+            return Response(
+                {'error': 'cart_items must be a list of cart items'},
+                status=status.HTTP_400_BAD_REQUEST)
 
-                product = Product.objects.get(id=product_id)
-
-                if CartItem.objects.filter(cart=user_cart, product=product):
-                    try:
-                        count = int(item["count"])
-                    except:
-                        return Response(
-                            {'error': 'Count must be an integer'},
-                            status=status.HTTP_404_NOT_FOUND)
-
-                    CartItem.objects.filter(
-                        cart=user_cart, product=product).update(count=count)
+        try:
+            user_cart = Cart.objects.get(user=user)
+            version = sync_cart(
+                user_cart.id, counts, expected_version(request))
 
-            return Response(
-                {'success': 'Cart Synchronized'},
-                status=status.HTTP_201_CREATED)
+            return versioned_response(
+                {'success': 'Cart Synchronized'}, version, status.HTTP_201_CREATED)
 
+        except CartVersionConflict:
+            return version_conflict_response(user_cart.id)
         except:
             return Response(
                 {'error': 'Something went wrong when retrieving cart items'},
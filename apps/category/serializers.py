@@ -4,6 +4,8 @@ from rest_framework import serializers
 class SubCategorySerializer(serializers.Serializer):
     id = serializers.IntegerField()
     name = serializers.CharField()
+    # Misma forma recursiva que la categoria padre
+    sub_categories = serializers.ListField(child=serializers.DictField())
 
 
 class CategorySerializer(serializers.Serializer):
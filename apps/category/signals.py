@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.stamps import touch_stamp
+from .models import Category
+from .tree import invalidate_category_tree
+
+
+@receiver([post_save, post_delete], sender=Category)
+def refresh_category_tree(sender, instance, **kwargs):
+    # Invalidar despues del commit para que nadie vuelva a cachear el arbol viejo
+    transaction.on_commit(invalidate_category_tree)
+    touch_stamp('category')
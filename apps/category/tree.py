@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core.caching import invalidated_timeout
+
+from .models import Category
+
+CACHE_KEY = 'category:tree'
+# Acota lo que dura un arbol guardado por una lectura que corrio antes del commit de un cambio
+TREE_TIMEOUT = 60 * 10
+
+
+class CategoryTree:
+    """Whole category table with each node's descendants precomputed."""
+
+    def __init__(self, rows):
+        names = {}
+        children = defaultdict(list)
+        roots = []
+        for category_id, name, parent_id in rows:
+            names[category_id] = name
+            if parent_id is None:
+                roots.append(category_id)
+            else:
+                children[parent_id].append(category_id)
+
+        self._descendants = {}
+        for category_id in names:
+            found = {category_id}
+            pending = [category_id]
+            while pending:
+                for child_id in children.get(pending.pop(), ()):
+                    if child_id not in found:
+                        found.add(child_id)
+                        pending.append(child_id)
+            self._descendants[category_id] = frozenset(found)
+
+        def build(category_id, seen):
+            return {
+                'id': category_id,
+                'name': names[category_id],
+                'sub_categories': [
+                    build(child_id, seen | {child_id})
+                    for child_id in children.get(category_id, ())
+                    if child_id not in seen
+                ],
+            }
+
+        self.menu = [build(category_id, {category_id}) for category_id in roots]
+
+    def exists(self, category_id):
+        return category_id in self._descendants
+
+    def descendants(self, category_id):
+        # Incluye la categoria misma; vacio si no existe
+        return self._descendants.get(category_id, frozenset())
+
+
+def build_category_tree():
+    # Del primario: el arbol queda en cache hasta el proximo cambio y una replica atrasada lo dejaria viejo
+    return CategoryTree(Category.objects.using(DEFAULT_DB_ALIAS).values_list('id', 'name', 'parent_id'))
+
+
+def get_category_tree():
+    tree = cache.get(CACHE_KEY)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(CACHE_KEY, tree, invalidated_timeout(TREE_TIMEOUT))
+    return tree
+
+
+def invalidate_category_tree():
+    cache.delete(CACHE_KEY)
+
+
+def descendants(category_id):
+    return get_category_tree().descendants(category_id)
@@ -6,10 +6,13 @@ from drf_spectacular.utils import extend_schema
 from core.views import CustomAPIView
 
 from .serializers import CategorySerializer
-from .models import Category
+from .tree import get_category_tree
 
 
 class ListCategoriesView(CustomAPIView):
+    cache_control = {'public': True, 'max_age': 300}
+    cache_stamps = ('category',)
+    replica_reads = True
 
     @extend_schema(
         description="Get all categories",
@@ -19,27 +22,10 @@ class ListCategoriesView(CustomAPIView):
 
     )
     def get(self, request, format=None):
-        if Category.objects.all().exists():
-            categories = Category.objects.all()
+        # El arbol completo (cualquier profundidad) se sirve desde cache
+        categories = get_category_tree().menu
 
-            result = []
-
-            for category in categories:
-                if not category.parent:
-                    item = {}
-                    item['id'] = category.id
-                    item['name'] = category.name
-
-                    item['sub_categories'] = []
-                    for cat in categories:
-                        sub_item = {}
-                        if cat.parent and cat.parent.id == category.id:
-                            sub_item['id'] = cat.id
-                            sub_item['name'] = cat.name
-                            sub_item['sub_categories'] = []
-
-                            item['sub_categories'].append(sub_item)
-                    result.append(item)
-            return Response({'categories': result}, status=status.HTTP_200_OK)
+        if categories:
+            return Response({'categories': categories}, status=status.HTTP_200_OK)
         else:
             return Response({'error': 'No categories found'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:18
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0002_alter_fixedpricecoupon_discount_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fixedpricecoupon',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='fixedpricecoupon_lower_name'),
+        ),
+        migrations.AddIndex(
+            model_name='percentagecoupon',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='percentagecoupon_lower_name'),
+        ),
+    ]
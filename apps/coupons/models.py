@@ -1,10 +1,17 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class FixedPriceCoupon(models.Model):
     name = models.CharField(max_length=255, unique=True)
     discount_price = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            # Busqueda sin distinguir mayusculas
+            models.Index(Lower('name'), name='fixedpricecoupon_lower_name'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -13,5 +20,10 @@ class PercentageCoupon(models.Model):
     name = models.CharField(max_length=255, unique=True)
     discount_percentage = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(Lower('name'), name='percentagecoupon_lower_name'),
+        ]
+
     def __str__(self):
         return self.name
@@ -0,0 +1,94 @@
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models.functions import Lower
+
+from .models import FixedPriceCoupon, PercentageCoupon
+
+# Limita la memoria cuando se prueban muchos nombres inexistentes
+MAX_ENTRIES = 1024
+
+
+@dataclass(frozen=True)
+class Coupon:
+    FIXED = 'fixed'
+    PERCENTAGE = 'percentage'
+
+    kind: str
+    name: str
+    value: int
+
+    def discount(self, total_amount):
+        """Amount taken off ``total_amount`` (a Decimal), or None when the coupon does not apply to it."""
+        if self.kind == self.FIXED:
+            if self.value < total_amount:
+                return Decimal(self.value)
+        elif 1 < self.value < 100:
+            return total_amount * Decimal(self.value) / 100
+        return None
+
+    def as_dict(self):
+        if self.kind == self.FIXED:
+            return {'name': self.name, 'discount_price': self.value}
+        return {'name': self.name, 'discount_percentage': self.value}
+
+
+def normalize(name):
+    return (name or '').strip().lower()
+
+
+def _load(key):
+    # Misma prioridad que antes: primero precio fijo, despues porcentaje
+    for kind, model, field in (
+        (Coupon.FIXED, FixedPriceCoupon, 'discount_price'),
+        (Coupon.PERCENTAGE, PercentageCoupon, 'discount_percentage'),
+    ):
+        row = (
+            model.objects.alias(name_lower=Lower('name'))
+            .filter(name_lower=key)
+            .order_by('id')
+            .values_list('name', field)
+            .first()
+        )
+        if row:
+            return Coupon(kind, *row)
+    return None
+
+
+class CouponResolver:
+    """Per-process map of normalized coupon names to coupons, with a TTL and negative caching."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def resolve(self, name):
+        key = normalize(name)
+        if not key:
+            return None
+
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        coupon = _load(key)
+        with self._lock:
+            if len(self._entries) >= MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[key] = (now + settings.COUPON_CACHE_TTL, coupon)
+        return coupon
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+resolver = CouponResolver()
+
+
+def resolve_coupon(name):
+    return resolver.resolve(name)
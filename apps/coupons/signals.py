@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import FixedPriceCoupon, PercentageCoupon
+from .resolver import resolver
+
+
+@receiver([post_save, post_delete], sender=FixedPriceCoupon)
+@receiver([post_save, post_delete], sender=PercentageCoupon)
+def clear_coupon_cache(sender, instance, **kwargs):
+    # Los otros workers se actualizan al expirar COUPON_CACHE_TTL
+    resolver.clear()
@@ -4,8 +4,8 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from core.views import CustomAPIView
-from .models import FixedPriceCoupon, PercentageCoupon
-from .serializers import FixedPriceCouponSerializer, PercentageCouponSerializer
+from .resolver import resolve_coupon
+from .serializers import FixedPriceCouponSerializer
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -39,22 +39,11 @@ class CheckCouponView(CustomAPIView):
     )
     def get(self, request, format=None):
         try:
-            coupon_name = request.query_params.get('coupon_name')
-
-            if FixedPriceCoupon.objects.filter(name=coupon_name).exists():
-                coupon = FixedPriceCoupon.objects.get(name=coupon_name)
-                coupon = FixedPriceCouponSerializer(coupon)
-
-                return Response(
-                    {'coupon': coupon.data},
-                    status=status.HTTP_200_OK
-                )
-            elif PercentageCoupon.objects.filter(name=coupon_name).exists():
-                coupon = PercentageCoupon.objects.get(name=coupon_name)
-                coupon = PercentageCouponSerializer(coupon)
+            coupon = resolve_coupon(request.query_params.get('coupon_name'))
 
+            if coupon:
                 return Response(
-                    {'coupon': coupon.data},
+                    {'coupon': coupon.as_dict()},
                     status=status.HTTP_200_OK
                 )
             else:
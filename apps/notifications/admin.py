@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import QueuedEmail
+
+
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts',
+                    'next_attempt_at', 'date_sent', )
+    list_display_links = ('id', 'subject', )
+    list_filter = ('status', )
+    search_fields = ('subject', )
+    list_per_page = 25
+
+
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send pending emails from the outbox, with batching and retry/backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backend', default=None,
+                            help='Email backend path, defaults to EMAIL_BACKEND')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait between polls when the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                backend=options['backend'],
+            )
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+# Tiempo que un worker tiene un lote reclamado; debe alcanzar para enviarlo entero
+LEASE_SECONDS = 60 * 5
+
+
+def queue_email(subject, body, from_email, recipients):
+    # Se guarda en la misma transaccion que el llamador; el worker lo envia despues
+    return QueuedEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email,
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due emails to this worker and count the attempt.
+
+    The lease is ``next_attempt_at``: other workers skip the rows until it
+    passes, so a worker that dies mid-batch only delays them by ``LEASE_SECONDS``.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        batch = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=QueuedEmail.Status.pending, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        for email in batch:
+            email.attempts += 1
+            email.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+        if batch:
+            QueuedEmail.objects.bulk_update(batch, ['attempts', 'next_attempt_at'])
+    return batch
+
+
+def _retry_later(email, error, max_attempts):
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = QueuedEmail.Status.failed
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def send_queued_emails(batch_size=50, max_attempts=5, backend=None):
+    """Send one batch of due emails over a single connection; returns (sent, failed)."""
+    sent = failed = 0
+    # El lote se reclama en una transaccion corta; el envio SMTP va fuera de ella
+    batch = claim_batch(batch_size)
+    if not batch:
+        return sent, failed
+
+    connection = get_connection(backend)
+    try:
+        connection.open()
+    except Exception as e:
+        # Sin servidor de correo: reintentar todo el lote mas tarde
+        for email in batch:
+            _retry_later(email, e, max_attempts)
+        QueuedEmail.objects.bulk_update(
+            batch, ['status', 'next_attempt_at', 'last_error'])
+        return sent, len(batch)
+
+    try:
+        for email in batch:
+            try:
+                EmailMessage(
+                    email.subject,
+                    email.body,
+                    email.from_email,
+                    email.recipients,
+                    connection=connection
+                ).send()
+                email.status = QueuedEmail.Status.sent
+                email.date_sent = timezone.now()
+                email.last_error = ''
+                sent += 1
+            except Exception as e:
+                _retry_later(email, e, max_attempts)
+                failed += 1
+    finally:
+        connection.close()
+
+    QueuedEmail.objects.bulk_update(
+        batch, ['status', 'next_attempt_at', 'last_error', 'date_sent'])
+    return sent, failed
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, PurchasedProduct
 # Register your models here.
 
 
@@ -23,3 +23,13 @@ class OrderItemAdmin(admin.ModelAdmin):
 
 
 admin.site.register(OrderItem, OrderItemAdmin)
+
+
+class PurchasedProductAdmin(admin.ModelAdmin):
+
+    list_display = ('id', 'user', 'product', 'first_purchase_at', )
+    list_display_links = ('id', )
+    list_per_page = 25
+
+
+admin.site.register(PurchasedProduct, PurchasedProductAdmin)
@@ -0,0 +1,37 @@
+from django.db import transaction
+
+from apps.cart.models import CartItem
+from apps.cart.versions import bump_cart, cart_change
+from apps.product.inventory import decrement_stock
+from .models import Order, OrderItem
+from .purchases import record_purchases
+
+
+def create_order(user, cart_id, cart_items, **order_fields):
+    """Raises CartVersionConflict if the cart changed after ``cart_items`` were read."""
+    # Stock, orden, items y vaciado del carrito se confirman juntos o no se confirma nada
+    with transaction.atomic(savepoint=False):
+        decrement_stock(
+            (cart_item.product, cart_item.count) for cart_item in cart_items)
+
+        order = Order.objects.create(user=user, **order_fields)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                product=cart_item.product,
+                order=order,
+                name=cart_item.product.name,
+                price=cart_item.product.price,
+                count=cart_item.count
+            )
+            for cart_item in cart_items
+        ])
+        record_purchases(
+            user, [cart_item.product_id for cart_item in cart_items], order.date_issued)
+
+        with cart_change(cart_id, atomic=False):
+            CartItem.objects.filter(cart_id=cart_id).delete()
+            # La orden se arma con cart_items: el carrito no puede haber cambiado
+            bump_cart(cart_id, cart_items[0].cart.version, total_items=0)
+
+    return order
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.orders.purchases import BACKFILL_BATCH_SIZE, backfill_purchases
+
+
+class Command(BaseCommand):
+    help = 'Fill the purchased-products table from existing orders. Safe to run more than once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = backfill_purchases(batch_size=options['batch_size'])
+        self.stdout.write(f'Checked {total} user/product pairs')
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:17
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0011_product_rating_aggregate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0006_rename_coupoun_descount_order_coupon_descount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchasedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_purchase_at', models.DateTimeField(default=datetime.datetime.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='product.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='purchasedproduct',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_purchased_product'),
+        ),
+    ]
@@ -48,3 +48,19 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class PurchasedProduct(models.Model):
+    # Una fila por (usuario, producto) comprado: verificar compras es una sola busqueda por indice
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    first_purchase_at = models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'product'], name='unique_purchased_product'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} - {self.product_id}'
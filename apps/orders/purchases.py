@@ -0,0 +1,42 @@
+from django.db.models import Min
+
+from .models import OrderItem, PurchasedProduct
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def record_purchases(user, product_ids, purchased_at=None):
+    # Las compras repetidas conservan la fecha de la primera
+    extra = {'first_purchase_at': purchased_at} if purchased_at else {}
+    PurchasedProduct.objects.bulk_create(
+        [PurchasedProduct(user=user, product_id=product_id, **extra)
+         for product_id in set(product_ids)],
+        ignore_conflicts=True,
+    )
+
+
+def has_purchased(user, product_id):
+    return PurchasedProduct.objects.filter(user=user, product_id=product_id).exists()
+
+
+def backfill_purchases(batch_size=BACKFILL_BATCH_SIZE):
+    """Create the missing PurchasedProduct rows from existing orders, returning how many were considered."""
+    rows = (
+        OrderItem.objects.values('order__user_id', 'product_id')
+        .annotate(first_purchase_at=Min('order__date_issued'))
+        .order_by()
+    )
+    batch = []
+    total = 0
+    for row in rows.iterator():
+        batch.append(PurchasedProduct(
+            user_id=row['order__user_id'],
+            product_id=row['product_id'],
+            first_purchase_at=row['first_purchase_at'],
+        ))
+        if len(batch) >= batch_size:
+            PurchasedProduct.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            batch = []
+    PurchasedProduct.objects.bulk_create(batch, ignore_conflicts=True)
+    return total + len(batch)
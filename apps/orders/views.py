@@ -1,14 +1,25 @@
-from rest_framework.views import APIView
+import hashlib
+
 from rest_framework.response import Response
 from rest_framework import status
-from core.views import AuthenticatedAPIView
+from core.views import AuthenticatedAPIView, CustomAPIView
 from .models import Order, OrderItem
 from .contries import Countries
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 
-class GetCountriesView(APIView):
+# La lista de paises es fija: su ETag solo cambia con el codigo
+COUNTRIES = [country[1] for country in Countries.choices]
+COUNTRIES_ETAG = '"countries-%s"' % hashlib.sha1('|'.join(COUNTRIES).encode()).hexdigest()[:20]
+
+
+class GetCountriesView(CustomAPIView):
+    cache_control = {'public': True, 'max_age': 86400}
+
+    def get_cache_validators(self, request, *args, **kwargs):
+        return COUNTRIES_ETAG, None
+
     @extend_schema(
         description="Get all available countries.",
         responses={
@@ -28,8 +39,7 @@ class GetCountriesView(APIView):
     )
     def get(self, request, format=None):
         return Response(
-            {'countries': [country[1]
-                           for country in Countries.choices]},
+            {'countries': COUNTRIES},
             status=status.HTTP_200_OK
         )
 
@@ -0,0 +1,180 @@
+import hashlib
+import os
+from dataclasses import asdict, dataclass, fields
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+import jwt
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.coupons.resolver import normalize, resolve_coupon
+from apps.shipping.models import Shipping
+
+TAX_RATE = Decimal('0.19')
+CENTS = Decimal('0.01')
+# El total mostrado en payment-total se reutiliza en make-payment durante este tiempo
+QUOTE_TIMEOUT = 5 * 60
+QUOTE_TOKEN_LIFETIME = timedelta(minutes=10)
+QUOTE_TOKEN_AUDIENCE = 'checkout-quote'
+
+payment_key = os.environ.get("PAYMENT_KEY")
+
+
+def money(value):
+    return Decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def cart_hash(cart_items):
+    # Cambia si cambia cualquier producto, cantidad o precio del carrito
+    contents = sorted(
+        (cart_item.product_id, cart_item.count,
+         cart_item.product.price, cart_item.product.compare_price)
+        for cart_item in cart_items
+    )
+    return hashlib.sha256(repr(contents).encode()).hexdigest()
+
+
+def cart_version(cart_items):
+    return cart_items[0].cart.version if cart_items else None
+
+
+@dataclass(frozen=True)
+class Quote:
+    cart_hash: str
+    cart_version: Optional[int]
+    coupon_name: str
+    shipping_id: Optional[int]
+    shipping_name: str
+    shipping_time: str
+    shipping_cost: Decimal
+    original_price: Decimal
+    total_compare_amount: Decimal
+    coupon_discount: Decimal
+    total_after_coupon: Optional[Decimal]
+    tax_rate: Decimal
+    tax_amount: Decimal
+    total: Decimal
+
+    def matches(self, cart_items, coupon_name, shipping_id):
+        return (
+            self.coupon_name == normalize(coupon_name)
+            and self.shipping_id == _shipping_pk(shipping_id)
+            and self.cart_version == cart_version(cart_items)
+            and self.cart_hash == cart_hash(cart_items)
+        )
+
+
+def _shipping_pk(shipping_id):
+    try:
+        return int(shipping_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_quote(cart_items, coupon_name, shipping_id):
+    """Price a preloaded cart (items with ``select_related('product')``) in one pass."""
+    original_price = Decimal(0)
+    total_compare_amount = Decimal(0)
+    for cart_item in cart_items:
+        original_price += cart_item.product.price * cart_item.count
+        total_compare_amount += cart_item.product.compare_price * cart_item.count
+
+    total_amount = original_price
+    coupon_discount = Decimal(0)
+    total_after_coupon = None
+    coupon = resolve_coupon(coupon_name)
+    if coupon:
+        discount = coupon.discount(total_amount)
+        if discount is not None:
+            coupon_discount = money(discount)
+            total_amount -= coupon_discount
+            total_after_coupon = total_amount
+
+    tax_amount = money(total_amount * TAX_RATE)
+
+    shipping_pk = _shipping_pk(shipping_id)
+    shipping = None
+    if shipping_pk is not None:
+        shipping = Shipping.objects.filter(id=shipping_pk).first()
+
+    shipping_cost = Decimal(shipping.price) if shipping else Decimal(0)
+
+    return Quote(
+        cart_hash=cart_hash(cart_items),
+        cart_version=cart_version(cart_items),
+        coupon_name=normalize(coupon_name),
+        shipping_id=shipping.id if shipping else None,
+        shipping_name=shipping.name if shipping else '',
+        shipping_time=shipping.time_to_delivery if shipping else '',
+        shipping_cost=money(shipping_cost),
+        original_price=money(original_price),
+        total_compare_amount=money(total_compare_amount),
+        coupon_discount=coupon_discount,
+        total_after_coupon=money(total_after_coupon) if total_after_coupon is not None else None,
+        tax_rate=TAX_RATE,
+        tax_amount=tax_amount,
+        total=money(total_amount + tax_amount + shipping_cost),
+    )
+
+
+def quote_key(user_id):
+    return f'payment:quote:{user_id}'
+
+
+def get_quote(user, cart_items, coupon_name, shipping_id):
+    """Reuse the user's last quote while cart, coupon and shipping are unchanged, otherwise price again."""
+    quote = cache.get(quote_key(user.id))
+    if quote is not None and quote.matches(cart_items, coupon_name, shipping_id):
+        return quote
+
+    quote = build_quote(cart_items, coupon_name, shipping_id)
+    cache.set(quote_key(user.id), quote, QUOTE_TIMEOUT)
+    return quote
+
+
+def invalidate_quote(user):
+    cache.delete(quote_key(user.id))
+
+
+def issue_quote_token(user, quote):
+    """Sign ``quote`` for ``user`` so make-payment can trust it without pricing the cart again."""
+    claims = {
+        name: str(value) if isinstance(value, Decimal) else value
+        for name, value in asdict(quote).items()
+    }
+    claims.update({
+        'sub': str(user.id),
+        'aud': QUOTE_TOKEN_AUDIENCE,
+        'exp': timezone.now() + QUOTE_TOKEN_LIFETIME,
+    })
+    return jwt.encode(claims, payment_key, algorithm="HS256")
+
+
+def read_quote_token(user, token, cart_items, coupon_name, shipping_id):
+    """The quote signed in ``token`` if it is valid and still matches the cart, coupon and shipping; else None."""
+    if not token:
+        return None
+    try:
+        claims = jwt.decode(
+            token, payment_key, algorithms=["HS256"], audience=QUOTE_TOKEN_AUDIENCE)
+    except jwt.InvalidTokenError:
+        return None
+    if claims.get('sub') != str(user.id) or claims.get('shipping_id') is None:
+        return None
+
+    try:
+        values = {}
+        for field in fields(Quote):
+            value = claims[field.name]
+            if field.type in (Decimal, Optional[Decimal]) and value is not None:
+                value = Decimal(value)
+            values[field.name] = value
+    except (KeyError, ArithmeticError):
+        return None
+
+    quote = Quote(**values)
+    if not quote.matches(cart_items, coupon_name, shipping_id):
+        return None
+    return quote
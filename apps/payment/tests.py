@@ -1,3 +1,185 @@
+from dataclasses import replace
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.cart.models import Cart, CartItem
+from apps.cart.repository import get_cart_items
+from apps.category.models import Category
+from apps.coupons.models import FixedPriceCoupon
+from apps.orders.models import Order
+from apps.product.models import Product
+from apps.shipping.models import Shipping
+from .pricing import build_quote, issue_quote_token
+
+ADDRESS = {
+    'coupon_name': '',
+    'full_name': 'Test User',
+    'address_line_1': 'Street 1',
+    'address_line_2': '',
+    'city': 'Bogota',
+    'state_province_region': 'Cundinamarca',
+    'postal_zip_code': '110111',
+    'country_region': 'Colombia',
+    'telephone_number': '3000000000',
+}
+
+
+class CheckoutTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='buyer@example.com', password='password', first_name='Buyer', last_name='Test')
+        category = Category.objects.create(name='Checkout')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Product {index}', description='Product', price=10,
+                    compare_price=20, category=category, quantity=5)
+            for index in range(3)
+        ])
+        cls.shipping = Shipping.objects.create(name='Standard', time_to_delivery='5 days', price=5)
+        cls.cart = Cart.objects.get(user=cls.user)
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cls.cart, product=product, count=2) for product in cls.products])
+        Cart.objects.filter(pk=cls.cart.pk).update(total_items=len(cls.products))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pay(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/payment/make-payment',
+                {**ADDRESS, 'shipping_id': self.shipping.id, **data}, format='json')
+
+    def stock(self):
+        return list(Product.objects.order_by('id').values_list('quantity', 'sold'))
+
+
+class CheckoutStockTest(CheckoutTestCase):
+    def assert_rejected(self, response, product_ids, before):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [failure['product_id'] for failure in response.data['failed_items']], product_ids)
+        self.assertEqual(self.stock(), before)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), len(self.products))
+
+    def test_success_decrements_once(self):
+        response = self.pay()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stock(), [(3, 2)] * 3)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_partial_shortfall(self):
+        first, second, third = self.products
+        Product.objects.filter(pk__in=[second.pk, third.pk]).update(quantity=1)
+        before = self.stock()
+        self.assert_rejected(self.pay(), [second.id, third.id], before)
+
+    def test_stock_taken_after_the_check(self):
+        # Otra compra descuenta entre la lectura del carrito y el UPDATE
+        second = self.products[1]
+
+        def stale_cart_items(user):
+            cart_items = get_cart_items(user)
+            Product.objects.filter(pk=second.pk).update(quantity=1)
+            return cart_items
+
+        with mock.patch('apps.payment.views.get_cart_items', stale_cart_items):
+            response = self.pay()
+        before = [(5, 0), (1, 0), (5, 0)]
+        self.assert_rejected(response, [second.id], before)
+
+    def test_cart_changed_after_the_read(self):
+        def stale_cart_items(user):
+            cart_items = get_cart_items(user)
+            Cart.objects.filter(pk=self.cart.pk).update(version=cart_items[0].cart.version + 1)
+            return cart_items
+
+        before = self.stock()
+        with mock.patch('apps.payment.views.get_cart_items', stale_cart_items):
+            response = self.pay()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.stock(), before)
+        self.assertFalse(Order.objects.exists())
+
+
+class QuoteTokenTest(CheckoutTestCase):
+    """make-payment trusts a quote token only while it is valid and matches the request."""
+
+    # Un total imposible: si la orden lo usa, el token fue aceptado
+    SIGNED_TOTAL = Decimal('1')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.express = Shipping.objects.create(name='Express', time_to_delivery='1 day', price=15)
+        FixedPriceCoupon.objects.create(name='TEST10', discount_price=10)
+        cls.other = get_user_model().objects.create_user(
+            email='other@example.com', password='password', first_name='Other', last_name='Test')
+
+    def token(self, user=None, coupon_name='', shipping=None):
+        quote = build_quote(
+            get_cart_items(self.user), coupon_name, (shipping or self.shipping).id)
+        return issue_quote_token(user or self.user, replace(quote, total=self.SIGNED_TOTAL))
+
+    def assert_charged(self, response, signed):
+        self.assertEqual(response.status_code, 200)
+        amount = Order.objects.get(user=self.user).amount
+        if signed:
+            self.assertEqual(amount, self.SIGNED_TOTAL)
+        else:
+            self.assertNotEqual(amount, self.SIGNED_TOTAL)
+
+    def test_valid_token_is_trusted(self):
+        self.assert_charged(self.pay(quote_token=self.token()), signed=True)
+
+    def test_token_from_payment_total(self):
+        response = self.client.get(
+            '/api/payment/payment-total', {'shipping_id': self.shipping.id, 'coupon_name': ''})
+        total = Decimal(response.data['final_total_amount'])
+        self.assertEqual(self.pay(quote_token=response.data['quote_token']).status_code, 200)
+        self.assertEqual(Order.objects.get(user=self.user).amount, int(total))
+
+    def test_tampered_token(self):
+        header, payload, signature = self.token().split('.')
+        tampered = '.'.join([header, payload, signature[::-1]])
+        self.assert_charged(self.pay(quote_token=tampered), signed=False)
+
+    def test_garbage_token(self):
+        self.assert_charged(self.pay(quote_token='not-a-token'), signed=False)
+
+    def test_cart_changed(self):
+        token = self.token()
+        item = CartItem.objects.filter(cart=self.cart).first()
+        item.count = 1
+        item.save()
+        self.assert_charged(self.pay(quote_token=token), signed=False)
+
+    def test_other_shipping(self):
+        token = self.token()
+        self.assert_charged(
+            self.pay(quote_token=token, shipping_id=self.express.id), signed=False)
+
+    def test_other_coupon(self):
+        token = self.token(coupon_name='TEST10')
+        self.assert_charged(self.pay(quote_token=token), signed=False)
+
+    def test_expired_token(self):
+        with mock.patch('apps.payment.pricing.QUOTE_TOKEN_LIFETIME', timedelta(seconds=-1)):
+            token = self.token()
+        self.assert_charged(self.pay(quote_token=token), signed=False)
+
+    def test_other_users_token(self):
+        self.assert_charged(self.pay(quote_token=self.token(user=self.other)), signed=False)
 
-# Create your tests here.
+    def test_token_without_shipping_is_rejected(self):
+        response = self.pay(quote_token=self.token(), shipping_id=0)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Order.objects.exists())
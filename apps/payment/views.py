@@ -1,20 +1,20 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from apps.cart.models import Cart, CartItem
-from apps.coupons.models import FixedPriceCoupon, PercentageCoupon
-from apps.orders.models import Order, OrderItem
-from apps.product.models import Product
-from apps.shipping.models import Shipping
-from django.core.mail import send_mail
+from apps.cart.repository import get_cart_items
+from apps.cart.snapshot import invalidate_product_carts
+from apps.cart.versions import CartVersionConflict
+from apps.notifications.outbox import queue_email
+from apps.orders.builder import create_order
+from apps.product.inventory import InsufficientStock
+from django.db import transaction
+from .pricing import get_quote, invalidate_quote, issue_quote_token, payment_key, read_quote_token
 import uuid
-import os
 import jwt
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 
 from core.views import AuthenticatedAPIView
 
-payment_key = os.environ.get("PAYMENT_KEY")
 
 
 class GenerateTokenView(APIView):
@@ -66,7 +66,8 @@ class GetPaymentTotalView(AuthenticatedAPIView):
                     "estimated_tax": {"type": "string"},
                     "shipping_cost": {"type": "string"},
                     "final_total_amount": {"type": "string"},
-                    "total_compare_amount": {"type": "string"}
+                    "total_compare_amount": {"type": "string"},
+                    "quote_token": {"type": "string", "nullable": True, "description": "Signed quote to send to make-payment, valid for 10 minutes; null without a valid shipping_id"}
                 },
                 "example": {
                     "original_price": "100.00",
@@ -74,7 +75,8 @@ class GetPaymentTotalView(AuthenticatedAPIView):
                     "estimated_tax": "0.19",
                     "shipping_cost": "5.00",
                     "final_total_amount": "95.00",
-                    "total_compare_amount": "120.00"
+                    "total_compare_amount": "120.00",
+                    "quote_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."
                 }
 
             },
@@ -116,96 +118,40 @@ class GetPaymentTotalView(AuthenticatedAPIView):
     def get(self, request, format=None):
         user = self.request.user
 
-        tax = 0.19
-
         shipping_id = request.query_params.get('shipping_id')
-        shipping_id = str(shipping_id)
         coupon_name = request.query_params.get('coupon_name')
-        coupon_name = str(coupon_name)
 
         try:
-            cart = Cart.objects.get(user=user)
+            cart_items = get_cart_items(user)
 
             # Revisar si existen items
-            if not CartItem.objects.filter(cart=cart).exists():
+            if not cart_items:
                 return Response(
                     {'error': 'Need to have items in cart'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            cart_items = CartItem.objects.filter(cart=cart)
-
             for cart_item in cart_items:
-                if not Product.objects.filter(id=cart_item.product.id).exists():
-                    return Response(
-                        {'error': 'A proudct with ID' +
-                            cart_item.product.id + ' does not exist'},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
                 if int(cart_item.count) > int(cart_item.product.quantity):
                     return Response(
                         {'error': f'Not enough {cart_item.product.name} items in stock'},
                         status=status.HTTP_200_OK
                     )
 
-                total_amount = 0.0
-                total_compare_amount = 0.0
-
-                for cart_item in cart_items:
-                    total_amount += (float(cart_item.product.price)
-                                     * float(cart_item.count))
-                    total_compare_amount += (float(cart_item.product.compare_price)
-                                             * float(cart_item.count))
-                original_price = total_amount
-                # Cupones
-                total_after_coupon = None
-                if coupon_name != '':
-                    # Revisar si cupon de precio fijo es valido
-                    if FixedPriceCoupon.objects.filter(name__iexact=coupon_name).exists():
-                        fixed_price_coupon = FixedPriceCoupon.objects.get(
-                            name=coupon_name
-                        )
-                        discount_amount = float(
-                            fixed_price_coupon.discount_price)
-                        if discount_amount < total_amount:
-                            total_amount -= discount_amount
-                            total_after_coupon = total_amount
-
-                    elif PercentageCoupon.objects.filter(name__iexact=coupon_name).exists():
-                        percentage_coupon = PercentageCoupon.objects.get(
-                            name=coupon_name
-                        )
-                        discount_percentage = float(
-                            percentage_coupon.discount_percentage)
-
-                        if discount_percentage > 1 and discount_percentage < 100:
-                            total_amount -= (total_amount *
-
-                                             (discount_percentage / 100))
-                            total_after_coupon = total_amount
-
-                total_amount += (total_amount * tax)
-
-                shipping_cost = 0.0
-                # verificar que el envio sea valido
-                if Shipping.objects.filter(id__iexact=shipping_id).exists():
-                    # agregar shipping a total amount
-                    shipping = Shipping.objects.get(id=shipping_id)
-                    shipping_cost = shipping.price
-                    total_amount += float(shipping_cost)
-
-                total_amount = round(total_amount, 2)
-
-                return Response({
-                    'original_price': f'{original_price}',
-                    'total_after_coupon': f'{total_after_coupon}' if total_after_coupon else None,
-                    'estimated_tax': f'{0.18}',
-                    'shipping_cost': f'{shipping_cost}',
-                    'final_total_amount': f'{total_amount:}',
-                    'total_compare_amount': f'{total_compare_amount}',
-                },
-                    status=status.HTTP_200_OK
-                )
+            quote = get_quote(user, cart_items, coupon_name, shipping_id)
+
+            return Response({
+                'original_price': f'{quote.original_price}',
+                'total_after_coupon': f'{quote.total_after_coupon}' if quote.total_after_coupon is not None else None,
+                'estimated_tax': f'{quote.tax_rate}',
+                'shipping_cost': f'{quote.shipping_cost}',
+                'final_total_amount': f'{quote.total}',
+                'total_compare_amount': f'{quote.total_compare_amount}',
+                # Sin un envio valido no hay quote que make-payment pueda aceptar
+                'quote_token': issue_quote_token(user, quote) if quote.shipping_id is not None else None,
+            },
+                status=status.HTTP_200_OK
+            )
 
         except:
             return Response(
@@ -230,6 +176,12 @@ class ProcessPaymentView(AuthenticatedAPIView):
                 required=False,
                 type=str,
             ),
+            OpenApiParameter(
+                name="quote_token",
+                description="The quote_token returned by payment-total (optional). When it is valid and the cart, coupon and shipping are unchanged, the quoted amounts are charged without pricing the cart again.",
+                required=False,
+                type=str,
+            ),
         ],
         responses={
             200: {
@@ -244,7 +196,8 @@ class ProcessPaymentView(AuthenticatedAPIView):
 
                 "type": "object",
                 "properties": {
-                    "error": {"type": "string"}
+                    "error": {"type": "string"},
+                    "failed_items": {"type": "array", "items": {"type": "object"}}
                 },
 
                 "example": {
@@ -264,6 +217,13 @@ class ProcessPaymentView(AuthenticatedAPIView):
                 "example": [{"error": "Need to have items in cart"}, {"error": "Transaction failed, a product ID 1 does not exist"}, {"error": "Invalid shipping option"}],
 
             },
+            409: {
+                "type": "object",
+                "properties": {
+                        "error": {"type": "string"}
+                },
+                "example": {"error": "The cart was modified by another request"}
+            },
             500: {
 
                 "type": "object",
@@ -271,8 +231,7 @@ class ProcessPaymentView(AuthenticatedAPIView):
                         "error": {"type": "string"}
                 },
                 "example":
-                    [{"error": "Something is wrong with the payment"}, {"error": "Transaction succeeded but failed to create the order"}, {"error": "Transaction succeeded and order created, but failed to create an order item"}, {
-                        "error": "Transaction succeeded and order created, but failed to send email"}, {"error": "Transaction succeeded and order successful, but failed to clear cart"}]
+                    [{"error": "Something is wrong with the payment"}, {"error": "Transaction succeeded but failed to create the order"}]
 
             }
         }
@@ -281,9 +240,8 @@ class ProcessPaymentView(AuthenticatedAPIView):
         user = self.request.user
         data = self.request.data
 
-        tax = 0.19
-        shipping_id = str(data['shipping_id'])
-        coupon_name = str(data['coupon_name'])
+        shipping_id = data['shipping_id']
+        coupon_name = data['coupon_name']
 
         full_name = data['full_name']
         address_line_1 = data['address_line_1']
@@ -294,77 +252,45 @@ class ProcessPaymentView(AuthenticatedAPIView):
         country_region = data['country_region']
         telephone_number = data['telephone_number']
 
-        # revisar si datos de shipping son validos
-        if not Shipping.objects.filter(id__iexact=shipping_id).exists():
+        cart_items = get_cart_items(user)
+
+        # Con un quote firmado y vigente para este mismo carrito solo queda
+        # la verificacion de stock atomica al crear la orden
+        quote = read_quote_token(
+            user, data.get('quote_token'), cart_items, coupon_name, shipping_id)
+
+        if quote is None:
+            # Reutiliza el total calculado en payment-total si el carrito no cambio
+            quote = get_quote(user, cart_items, coupon_name, shipping_id)
+
+        # revisar si datos de shipping son validos (tambien con quote firmado)
+        if quote.shipping_id is None:
             return Response(
                 {'error': 'Invalid shipping option'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        cart = Cart.objects.get(user=user)
-
         # revisar si usuario tiene items en carrito
-        if not CartItem.objects.filter(cart=cart).exists():
+        if not cart_items:
             return Response(
                 {'error': 'Need to have items in cart'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        cart_items = CartItem.objects.filter(cart=cart)
-
-        # revisar si hay stock
-
-        for cart_item in cart_items:
-            if not Product.objects.filter(id=cart_item.product.id).exists():
-                return Response(
-                    {'error': 'Transaction failed, a product ID ' +
-                        cart_item.product.id+' does not exist'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            if int(cart_item.count) > int(cart_item.product.quantity):
-                return Response(
-                    {'error': 'Not enough '+cart_item.product.name+' items in stock'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        total_amount = 0.0
-
-        for cart_item in cart_items:
-            total_amount += (float(cart_item.product.price)
-                             * float(cart_item.count))
-        coupon_descount = 0
-        # Cupones
-        if coupon_name != '':
-            if FixedPriceCoupon.objects.filter(name__iexact=coupon_name).exists():
-                fixed_price_coupon = FixedPriceCoupon.objects.get(
-                    name=coupon_name
-                )
-                discount_amount = float(fixed_price_coupon.discount_price)
-                if discount_amount < total_amount:
-                    coupon_descount = discount_amount
-                    total_amount -= discount_amount
-
-            elif PercentageCoupon.objects.filter(name__iexact=coupon_name).exists():
-                percentage_coupon = PercentageCoupon.objects.get(
-                    name=coupon_name
-                )
-                discount_percentage = float(
-                    percentage_coupon.discount_percentage)
-
-                if discount_percentage > 1 and discount_percentage < 100:
-                    coupon_descount = (total_amount *
-                                       (discount_percentage / 100))
-                    total_amount -= coupon_descount
-
-        total_amount += (total_amount * tax)
-
-        shipping = Shipping.objects.get(id=int(shipping_id))
-
-        shipping_name = shipping.name
-        shipping_time = shipping.time_to_delivery
-        shipping_price = shipping.price
+        # revisar si hay stock (la verificacion definitiva se hace al descontar)
+        failures = [
+            {'product_id': cart_item.product_id, 'name': cart_item.product.name,
+             'requested': cart_item.count}
+            for cart_item in cart_items
+            if int(cart_item.count) > int(cart_item.product.quantity)
+        ]
+        if failures:
+            return Response(
+                {'error': 'Not enough ' + failures[0]['name'] + ' items in stock',
+                 'failed_items': failures},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        total_amount += float(shipping_price)
         newTransaction = {"is_success": False}
         try:
             payload = {
@@ -380,96 +306,61 @@ class ProcessPaymentView(AuthenticatedAPIView):
             )
 
         if newTransaction['is_success']:
-            for cart_item in cart_items:
-                update_product = Product.objects.get(id=cart_item.product.id)
-
-                # encontrar cantidad despues de coompra
-                quantity = int(update_product.quantity) - int(cart_item.count)
-
-                # obtener cantidad de producto por vender
-                sold = int(update_product.sold) + int(cart_item.count)
-
-                # actualizar el producto
-                Product.objects.filter(id=cart_item.product.id).update(
-                    quantity=quantity, sold=sold
-                )
-
-            # crear orden
+            # crear orden: stock, orden, items y carrito en una sola transaccion
             try:
-                order = Order.objects.create(
-                    user=user,
-                    transaction_id=newTransaction["id"],
-                    amount=total_amount,
-                    full_name=full_name,
-                    address_line_1=address_line_1,
-                    address_line_2=address_line_2,
-                    city=city,
-                    state_province_region=state_province_region,
-                    postal_zip_code=postal_zip_code,
-                    country_region=country_region,
-                    telephone_number=telephone_number,
-                    shipping_name=shipping_name,
-                    shipping_time=shipping_time,
-                    shipping_price=float(shipping_price),
-                    coupon_descount=coupon_descount
-                )
-            except:
-                return Response(
-                    {'error': 'Transaction succeeded but failed to create the order'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            for cart_item in cart_items:
-                try:
-                    # agarrar el producto
-                    product = Product.objects.get(id=cart_item.product.id)
-
-                    OrderItem.objects.create(
-                        product=product,
-                        order=order,
-                        name=product.name,
-                        price=cart_item.product.price,
-                        count=cart_item.count
-                    )
-                except Exception as e:
-                    print(e)
-                    return Response(
-                        {'error': 'Transaction succeeded and order created, but failed to create an order item'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                with transaction.atomic():
+                    create_order(
+                        user,
+                        cart_items[0].cart_id,
+                        cart_items,
+                        transaction_id=newTransaction["id"],
+                        amount=quote.total,
+                        full_name=full_name,
+                        address_line_1=address_line_1,
+                        address_line_2=address_line_2,
+                        city=city,
+                        state_province_region=state_province_region,
+                        postal_zip_code=postal_zip_code,
+                        country_region=country_region,
+                        telephone_number=telephone_number,
+                        shipping_name=quote.shipping_name,
+                        shipping_time=quote.shipping_time,
+                        shipping_price=quote.shipping_cost,
+                        coupon_descount=quote.coupon_discount
                     )
 
-            try:
-                send_mail(
-                    'Your Order Details',
-                    'Hey ' + full_name + ','
-                    + '\n\nWe received your order!'
-                    + '\n\nGive us some time to process your order and ship it out to you.'
-                    + '\n\nYou can go on your user dashboard to check the status of your order.'
-                    + '\n\nSincerely,'
-                    + '\nShop Time',
-                    'carlosmortshop@gmail.com',  # Cambia esto a una dirección de correo válida
-                    [user.email],
-                    fail_silently=False
+                    # el correo queda en la cola dentro de la misma transaccion
+                    queue_email(
+                        'Your Order Details',
+                        'Hey ' + full_name + ','
+                        + '\n\nWe received your order!'
+                        + '\n\nGive us some time to process your order and ship it out to you.'
+                        + '\n\nYou can go on your user dashboard to check the status of your order.'
+                        + '\n\nSincerely,'
+                        + '\nShop Time',
+                        'carlosmortshop@gmail.com',  # Cambia esto a una dirección de correo válida
+                        [user.email]
+                    )
+            except InsufficientStock as e:
+                return Response(
+                    {'error': 'Not enough ' + e.failures[0]['name'] + ' items in stock',
+                     'failed_items': e.failures},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-
-            except Exception as e:
-                print(e)
+            except CartVersionConflict:
                 return Response(
-                    {'error': 'Transaction succeeded and order created, but failed to send email'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    {'error': 'The cart was modified by another request'},
+                    status=status.HTTP_409_CONFLICT
                 )
-
-            try:
-                # Vaciar carrito de compras
-                CartItem.objects.filter(cart=cart).delete()
-
-                # Actualizar carrito
-                Cart.objects.filter(user=user).update(total_items=0)
-            except:
+            except Exception as e:
+                print(e)
                 return Response(
-                    {'error': 'Transaction succeeded and order successful, but failed to clear cart'},
+                    {'error': 'Transaction succeeded but failed to create the order'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
+            invalidate_product_carts(
+                [cart_item.product_id for cart_item in cart_items])
+            invalidate_quote(user)
 
             return Response(
                 {'success': 'Transaction successful and order was created'},
@@ -1,12 +1,12 @@
 from django.contrib import admin
 from django import forms
 
-from apps.product.models import Product
+from apps.product.models import PhotoUpload, Product
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'compare_price',
-                    'price', 'quantity', 'sold', 'rating')
+                    'price', 'quantity', 'sold', 'rating', 'photo_status')
     list_display_links = ('id', 'name', )
     list_filter = ('category', )
     list_editable = ('compare_price', 'price', 'quantity', )
@@ -28,3 +28,9 @@ class ProductAdmin(admin.ModelAdmin):
         else:
             super().save_model(request, obj, form, change)
 
+
+@admin.register(PhotoUpload)
+class PhotoUploadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'attempts', 'next_attempt_at', )
+    list_display_links = ('id', 'product', )
+    list_per_page = 25
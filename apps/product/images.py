@@ -0,0 +1,60 @@
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+VARIANT_WIDTHS = (160, 320, 640)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_key(image_format, width):
+    return f'{image_format}:{width}'
+
+
+def build_variants(path, skip=()):
+    """Yield ``(key, (filename, file, content_type))`` for each resized variant of ``path``.
+
+    Widths larger than the original are not upscaled; variants already in ``skip`` are not encoded.
+    """
+    try:
+        source = Image.open(path)
+    except UnidentifiedImageError:
+        return
+
+    with source:
+        source = ImageOps.exif_transpose(source)
+        widths = sorted({min(width, source.width) for width in VARIANT_WIDTHS})
+
+        for width in widths:
+            height = max(1, round(source.height * width / source.width))
+            resized = None
+            for image_format, (pil_format, content_type, options) in VARIANT_FORMATS.items():
+                key = variant_key(image_format, width)
+                if key in skip:
+                    continue
+                if resized is None:
+                    resized = source.convert('RGBA').resize((width, height), Image.LANCZOS)
+
+                image = resized
+                if pil_format == 'JPEG':
+                    # JPEG no tiene canal alfa: componer sobre fondo blanco
+                    image = Image.new('RGB', resized.size, (255, 255, 255))
+                    image.paste(resized, mask=resized.getchannel('A'))
+
+                buffer = BytesIO()
+                image.save(buffer, pil_format, **options)
+                buffer.seek(0)
+                yield key, (f'{width}w.{image_format}', buffer, content_type)
+
+
+def variants_map(results):
+    # {'webp': {'160': url, ...}, 'jpeg': {...}} a partir de las claves 'formato:ancho'
+    variants = {}
+    for key, link in results.items():
+        if ':' not in key:
+            continue
+        image_format, width = key.split(':', 1)
+        variants.setdefault(image_format, {})[width] = link
+    return variants
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core.stamps import touch_stamp
+
+from .models import Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__(
+            'Not enough stock for products %s' % [failure['product_id'] for failure in failures])
+
+
+def decrement_stock(items):
+    """Take ``count`` units of each ``(product, count)`` pair in one transaction,
+    or none at all: raises ``InsufficientStock`` listing every shortfall.
+
+    Two queries whatever the number of products: a locking read and one UPDATE.
+    Inside an outer transaction (e.g. ``create_order``) a shortfall rolls it all back.
+    """
+    counts = {}
+    names = {}
+    for product, count in items:
+        counts[product.id] = counts.get(product.id, 0) + count
+        names[product.id] = product.name
+
+    def shortfalls(product_ids):
+        return [
+            {'product_id': product_id, 'name': names[product_id], 'requested': counts[product_id]}
+            for product_id in sorted(product_ids)
+        ]
+
+    requested = Case(
+        *[When(id=product_id, then=Value(count)) for product_id, count in counts.items()],
+        default=Value(0), output_field=IntegerField())
+
+    # Un faltante deshace toda la transaccion del llamador: no hace falta un savepoint
+    with transaction.atomic(savepoint=False):
+        # Bloquea las filas en orden de id: dos compras con los mismos productos
+        # las toman en el mismo orden y no pueden quedar en deadlock
+        stock = dict(
+            Product.objects.select_for_update().filter(id__in=counts)
+            .order_by('id').values_list('id', 'quantity'))
+        failures = shortfalls(
+            product_id for product_id, count in counts.items() if stock.get(product_id, 0) < count)
+        if failures:
+            raise InsufficientStock(failures)
+
+        # La condicion de stock sigue en el WHERE: sin bloqueo de filas (SQLite)
+        # otra compra pudo descontar entre la lectura y el UPDATE
+        updated = Product.objects.filter(id__in=counts, quantity__gte=requested).update(
+            quantity=F('quantity') - requested, sold=F('sold') + requested)
+        if updated != len(counts):
+            raise InsufficientStock(shortfalls(counts))
+
+        # .update() no dispara post_save: quantity/sold cambian en el detalle
+        touch_stamp('product')
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.product.uploads import process_photo_uploads
+
+
+class Command(BaseCommand):
+    help = 'Upload pending product photos to the image API, with retry/backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for uploads instead of exiting when there are none')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait between polls when there is nothing to upload')
+
+    def handle(self, *args, **options):
+        while True:
+            uploaded, failed = process_photo_uploads(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+            )
+            if uploaded or failed:
+                self.stdout.write(f'Uploaded {uploaded} photos, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
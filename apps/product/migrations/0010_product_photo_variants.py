@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0009_photo_upload_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photoupload',
+            name='results',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
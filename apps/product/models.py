@@ -1,35 +1,49 @@
-from django.db import models
+import os
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.utils import timezone
 from apps.category.models import Category
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
-from .utils import upload_image_to_api
+from .utils import spool_upload
 
 
 class ProductManager(models.Manager):
     def create_product(self, name, photo, description, price, compare_price, category, quantity, sold, rating):
+        spool_path = None
         try:
-            product = self.create(name=name,    description=description, price=price,
-                                  compare_price=compare_price, category=category, quantity=quantity, sold=sold, rating=rating)
-
-            # Process the photo
+            # La foto se copia a disco y se sube a la API en segundo plano (manage.py upload_product_photos)
             if photo:
-                temp_file = ContentFile(photo.read())
-                response = upload_image_to_api(
-                    temp_file, name=name, description=description)
+                spool_path = spool_upload(photo)
+
+            with transaction.atomic():
+                product = self.create(name=name,    description=description, price=price,
+                                      compare_price=compare_price, category=category, quantity=quantity, sold=sold, rating=rating,
+                                      photo_status=Product.PhotoStatus.pending if spool_path else Product.PhotoStatus.ready)
 
-                if response.status_code in [200, 201]:
-                    product.photo = response.json().get('data').get('link')
-                    product.save()
+                if spool_path:
+                    PhotoUpload.objects.create(
+                        product=product, spool_path=spool_path)
 
             return product
         except Exception as e:
             print(e)
+            if spool_path and os.path.exists(spool_path):
+                os.remove(spool_path)
 
 
 class Product(models.Model):
+    class PhotoStatus(models.TextChoices):
+        pending = 'pending'
+        ready = 'ready'
+        failed = 'failed'
+
     name = models.CharField(max_length=255)
     photo = models.ImageField(upload_to='photos/%Y/%m/')
+    photo_status = models.CharField(
+        max_length=20, choices=PhotoStatus.choices, default=PhotoStatus.ready)
+    # Miniaturas generadas al subir la foto: {'webp': {'160': url, ...}, 'jpeg': {...}}
+    photo_variants = models.JSONField(default=dict, blank=True)
     description = models.TextField()
     price = models.PositiveIntegerField()
     compare_price = models.PositiveIntegerField()
@@ -42,15 +56,63 @@ class Product(models.Model):
         decimal_places=1,
         default=5,
     )
+    # Agregado de las reviews, mantenido incrementalmente; rating = rating_sum / rating_count
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
     objects = ProductManager()
 
     class Meta:
         ordering = ['date_created']
+        indexes = [
+            GinIndex(fields=['search_vector'],
+                     name='product_search_vector_idx'),
+            GinIndex(fields=['name'], name='product_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            # Indices compuestos para la paginacion por cursor (sortBy, id)
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['sold', 'id'], name='product_sold_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['rating', 'id'],
+                         name='product_rating_id_idx'),
+            models.Index(fields=['date_created', 'id'],
+                         name='product_date_created_id_idx'),
+        ]
 
     def get_thumbnail(self):
+        jpeg = self.photo_variants.get('jpeg')
+        if jpeg:
+            return jpeg[min(jpeg, key=int)]
         if self.photo:
             return self.photo.url
         return ''
 
+    def get_srcset(self):
+        return {
+            image_format: ', '.join(
+                f'{variants[width]} {width}w' for width in sorted(variants, key=int))
+            for image_format, variants in self.photo_variants.items()
+        }
+
     def __str__(self):
         return self.name
+
+
+class PhotoUpload(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    spool_path = models.CharField(max_length=500)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Enlaces ya subidos: {'original': url, 'webp:160': url, ...}
+    results = models.JSONField(default=dict, blank=True)
+    date_created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at'],
+                         name='photoupload_next_attempt_idx'),
+        ]
+
+    def __str__(self):
+        return self.spool_path
@@ -0,0 +1,223 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+# 'simple' evita el stemming para que los prefijos coincidan con lo que escribe el usuario
+SEARCH_CONFIG = 'simple'
+SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+)
+MAX_LOCAL_RESULTS = 1000
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def _edit_distance(a, b, limit):
+    # Distancia de Damerau-Levenshtein (transposiciones cuentan 1) con corte temprano
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                distance = min(distance, before_previous[j - 2] + 1)
+            current.append(distance)
+        if min(current) > limit and min(previous) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+def _typo_limit(term):
+    if len(term) >= 8:
+        return 2
+    if len(term) >= 4:
+        return 1
+    return 0
+
+
+class LocalSearchIndex:
+    """In-process inverted index used when the database is not PostgreSQL."""
+
+    NAME_WEIGHT = 2.0
+    DESCRIPTION_WEIGHT = 1.0
+    EXACT_SCORE = 1.0
+    PREFIX_SCORE = 0.8
+    TYPO_SCORE = 0.5
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._sorted_tokens = []
+        self._tokens_by_length = defaultdict(set)
+        self._dirty = False
+
+    def reset(self):
+        with self._lock:
+            self._loaded = False
+            self._postings.clear()
+            self._documents.clear()
+            self._sorted_tokens = []
+            self._tokens_by_length.clear()
+            self._dirty = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        from .models import Product
+
+        with self._lock:
+            if self._loaded:
+                return
+            # Del primario: despues solo se actualiza con las señales de Product
+            products = Product.objects.using(DEFAULT_DB_ALIAS).values_list('id', 'name', 'description')
+            for product_id, name, description in products.iterator():
+                self._add(product_id, name, description)
+            self._loaded = True
+
+    def _add(self, product_id, name, description):
+        self._remove(product_id)
+        weights = {}
+        for token in tokenize(description):
+            weights[token] = self.DESCRIPTION_WEIGHT
+        for token in tokenize(name):
+            weights[token] = self.NAME_WEIGHT
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._tokens_by_length[len(token)].add(token)
+                self._dirty = True
+            self._postings[token][product_id] = weight
+        self._documents[product_id] = set(weights)
+
+    def _remove(self, product_id):
+        for token in self._documents.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                self._tokens_by_length[len(token)].discard(token)
+                self._dirty = True
+
+    def add(self, product_id, name, description):
+        with self._lock:
+            if self._loaded:
+                self._add(product_id, name, description)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(product_id)
+
+    def _matching_tokens(self, term):
+        if self._dirty:
+            self._sorted_tokens = sorted(self._postings)
+            self._dirty = False
+
+        matches = {}
+        start = bisect.bisect_left(self._sorted_tokens, term)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(term):
+                break
+            matches[token] = self.EXACT_SCORE if token == term else self.PREFIX_SCORE
+
+        limit = _typo_limit(term)
+        for length in range(len(term) - limit, len(term) + limit + 1):
+            for token in self._tokens_by_length.get(length, ()):
+                if token not in matches and _edit_distance(term, token, limit) <= limit:
+                    matches[token] = self.TYPO_SCORE
+        return matches
+
+    def search(self, terms):
+        self._ensure_loaded()
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, match_score in self._matching_tokens(term).items():
+                    for product_id, weight in self._postings[token].items():
+                        score = match_score * weight
+                        if score > term_scores.get(product_id, 0):
+                            term_scores[product_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        product_id: scores[product_id] + score
+                        for product_id, score in term_scores.items()
+                        if product_id in scores
+                    }
+                if not scores:
+                    return {}
+            return scores or {}
+
+
+local_index = LocalSearchIndex()
+
+
+def index_product(product):
+    if uses_postgres():
+        type(product).objects.filter(pk=product.pk).update(search_vector=SEARCH_VECTOR)
+    else:
+        local_index.add(product.pk, product.name, product.description)
+
+
+def unindex_product(product_id):
+    if not uses_postgres():
+        local_index.remove(product_id)
+
+
+def search_products(queryset, search):
+    """Narrow ``queryset`` to products matching ``search`` and annotate a ``rank``."""
+    terms = tokenize(search)
+    if not terms:
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    if uses_postgres():
+        # Prefijos sobre el tsvector indexado y similitud de trigramas para errores de tipeo
+        query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            config=SEARCH_CONFIG,
+            search_type='raw',
+        )
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_word_similar=search)
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query) + TrigramWordSimilarity(search, 'name')
+        )
+
+    scores = local_index.search(terms)
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:MAX_LOCAL_RESULTS]
+    if not best:
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(id__in=[product_id for product_id, _ in best]).annotate(
+        rank=Case(
+            *[When(id=product_id, then=Value(score)) for product_id, score in best],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
@@ -5,6 +5,9 @@ from .models import Product
 class ProductSerializer(serializers.ModelSerializer):
     # Usar un campo CharField para devolver la URL de la imagen en lugar de ImageField
     photo = serializers.CharField(read_only=True)
+    # {'webp': 'url 160w, url 320w, ...', 'jpeg': '...'}
+    srcset = serializers.DictField(
+        child=serializers.CharField(), source='get_srcset', read_only=True)
 
     class Meta:
         model = Product
@@ -12,6 +15,7 @@ class ProductSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'photo',
+            'photo_status',
             'description',
             'price',
             'compare_price',
@@ -20,7 +24,8 @@ class ProductSerializer(serializers.ModelSerializer):
             'sold',
             'date_created',
             'rating',
-            'get_thumbnail'
+            'get_thumbnail',
+            'srcset'
         ]
 
     def get_photo(self, obj) -> str:
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.stamps import touch_stamp
+from .models import Product
+from .search import index_product, unindex_product
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def touch_product_stamp(sender, instance, **kwargs):
+    touch_stamp('product')
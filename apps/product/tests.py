@@ -1,3 +1,143 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.category.models import Category
+from .inventory import InsufficientStock, decrement_stock
+from .models import PhotoUpload, Product
+from .uploads import process_photo_upload
+
+
+class DecrementStockTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Stock')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Product {index}', description='Product', price=10,
+                    compare_price=20, category=category, quantity=quantity, sold=1)
+            for index, quantity in enumerate((5, 2, 8))
+        ])
+
+    def stock(self):
+        return list(Product.objects.order_by('id').values_list('quantity', 'sold'))
+
+    def test_takes_every_count_once(self):
+        first, second, third = self.products
+        decrement_stock([(first, 2), (second, 2), (third, 1), (first, 1)])
+        self.assertEqual(self.stock(), [(2, 4), (0, 3), (7, 2)])
+
+    def test_shortfall_changes_nothing(self):
+        first, second, third = self.products
+        before = self.stock()
+        with self.assertRaises(InsufficientStock) as raised, transaction.atomic():
+            decrement_stock([(first, 1), (second, 3), (third, 9)])
+        self.assertEqual(
+            [failure['product_id'] for failure in raised.exception.failures],
+            [second.id, third.id])
+        self.assertEqual(self.stock(), before)
+
+    def test_counts_of_the_same_product_add_up(self):
+        first = self.products[0]
+        with self.assertRaises(InsufficientStock), transaction.atomic():
+            decrement_stock([(first, 3), (first, 3)])
+        self.assertEqual(self.stock()[0], (5, 1))
+
+
+class PhotoUploadTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Photos')
+        self.product = Product.objects.create(
+            name='Photo', description='Product', price=10, compare_price=20,
+            category=category, photo_status=Product.PhotoStatus.pending)
+        spool, path = tempfile.mkstemp()
+        os.close(spool)
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        self.job = PhotoUpload.objects.create(product=self.product, spool_path=path)
+
+    def process(self, upload, max_attempts=5):
+        with mock.patch('apps.product.uploads.upload_image_to_api', upload), \
+                mock.patch('apps.product.uploads.build_variants', lambda path, skip: []):
+            return process_photo_upload(self.job, max_attempts)
+
+    def test_ready(self):
+        self.assertTrue(self.process(lambda image, **data: 'https://img/original.jpg'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.photo_status, Product.PhotoStatus.ready)
+        self.assertFalse(PhotoUpload.objects.exists())
+        self.assertFalse(os.path.exists(self.job.spool_path))
+
+    def test_product_deleted_during_upload(self):
+        def upload(image, **data):
+            Product.objects.filter(pk=self.product.pk).delete()
+            return 'https://img/original.jpg'
+
+        self.assertFalse(self.process(upload))
+        self.assertFalse(PhotoUpload.objects.exists())
+        self.assertFalse(os.path.exists(self.job.spool_path))
+
+    def test_product_deleted_before_the_last_failure(self):
+        def upload(image, **data):
+            Product.objects.filter(pk=self.product.pk).delete()
+            raise ConnectionError('upload failed')
+
+        self.assertFalse(self.process(upload, max_attempts=1))
+        self.assertFalse(os.path.exists(self.job.spool_path))
+
+    def test_product_deleted_before_a_retry(self):
+        def upload(image, **data):
+            Product.objects.filter(pk=self.product.pk).delete()
+            raise ConnectionError('upload failed')
+
+        self.assertFalse(self.process(upload))
+        self.assertFalse(os.path.exists(self.job.spool_path))
+
+
+class ConditionalProductDetailTest(TestCase):
+    """The product detail answers 304 until a product changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Detail')
+        cls.product = Product.objects.create(
+            name='Detail', description='Product', price=10, compare_price=20,
+            category=category, quantity=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = f'/api/product/{self.product.id}'
+        # Sin sello guardado la primera respuesta no trae ETag
+        self.assertNotIn('ETag', self.client.get(self.url))
+        self.etag = self.client.get(self.url)['ETag']
+
+    def get(self):
+        return self.client.get(self.url, headers={'If-None-Match': self.etag})
+
+    def assert_changed(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+
+    def test_not_modified(self):
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+
+    def test_product_saved(self):
+        self.assertEqual(self.get().status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 12
+            self.product.save()
+        self.assert_changed()
 
-# Create your tests here.
+    def test_stock_decremented(self):
+        # decrement_stock usa .update(), que no dispara post_save
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            decrement_stock([(self.product, 1)])
+        self.assert_changed()
@@ -0,0 +1,106 @@
+import os
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .images import build_variants, variants_map
+from .models import PhotoUpload, Product
+from .utils import upload_image_to_api
+
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+# Tiempo que un worker se reserva un trabajo mientras sube la imagen
+LEASE = timedelta(minutes=10)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_photo_uploads(batch_size):
+    # Reservar el lote sin mantener la transaccion abierta durante las subidas
+    with transaction.atomic():
+        now = timezone.now()
+        batch = list(
+            PhotoUpload.objects.select_for_update(skip_locked=True)
+            .select_related('product')
+            .filter(next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            PhotoUpload.objects.filter(
+                id__in=[job.id for job in batch]
+            ).update(next_attempt_at=now + LEASE)
+    return batch
+
+
+def _discard_spool(job):
+    if os.path.exists(job.spool_path):
+        os.remove(job.spool_path)
+
+
+def _lock_product(product):
+    # El producto pudo borrarse durante la subida (y su PhotoUpload en cascada)
+    return Product.objects.select_for_update().filter(pk=product.pk).exists()
+
+
+def process_photo_upload(job, max_attempts=5):
+    product = job.product
+    # Lo que ya se subio en intentos anteriores no se vuelve a subir
+    results = dict(job.results)
+    try:
+        if 'original' not in results:
+            with open(job.spool_path, 'rb') as image:
+                results['original'] = upload_image_to_api(
+                    image, name=product.name, description=product.description)
+
+        for key, variant in build_variants(job.spool_path, skip=results):
+            results[key] = upload_image_to_api(
+                variant, name=product.name, description=product.description)
+    except Exception as e:
+        job.attempts += 1
+        job.last_error = str(e)
+        job.results = results
+        if job.attempts >= max_attempts or isinstance(e, FileNotFoundError):
+            try:
+                with transaction.atomic():
+                    if _lock_product(product):
+                        product.photo_status = Product.PhotoStatus.failed
+                        product.save(update_fields=['photo_status'])
+                    job.delete()
+            finally:
+                _discard_spool(job)
+        else:
+            job.next_attempt_at = timezone.now() + retry_delay(job.attempts)
+            retried = PhotoUpload.objects.filter(pk=job.pk).update(
+                attempts=job.attempts, last_error=job.last_error,
+                next_attempt_at=job.next_attempt_at, results=results)
+            if not retried:
+                _discard_spool(job)
+        return False
+
+    try:
+        with transaction.atomic():
+            if not _lock_product(product):
+                job.delete()
+                return False
+            product.photo = results['original']
+            product.photo_variants = variants_map(results)
+            product.photo_status = Product.PhotoStatus.ready
+            product.save(update_fields=['photo', 'photo_variants', 'photo_status'])
+            job.delete()
+    finally:
+        _discard_spool(job)
+    return True
+
+
+def process_photo_uploads(batch_size=10, max_attempts=5):
+    """Upload one batch of pending product photos; returns (uploaded, failed)."""
+    uploaded = failed = 0
+    for job in claim_photo_uploads(batch_size):
+        if process_photo_upload(job, max_attempts):
+            uploaded += 1
+        else:
+            failed += 1
+    return uploaded, failed
@@ -1,9 +1,12 @@
-import requests
 import os
+import uuid
+
+import requests
+from django.conf import settings
 
 
-def upload_image_to_api(image_path, **other_data):
-    api_url = 'https://api.imgur.com/3/image'
+def upload_image_to_api(image, **other_data):
+    api_url = settings.IMAGE_UPLOAD_URL
     headers = {
         'Authorization': f'Client-ID {os.environ.get("IMGUR_CLIENT_ID")}'
     }
@@ -12,12 +15,23 @@ def upload_image_to_api(image_path, **other_data):
         'title': other_data['name'],
         'description': other_data['description'],
     }
-    try:
-        files = {
-            'image': image_path
-        }
-        response = requests.post(api_url, files=files,
-                                 data=data, headers=headers)
-        return response
-    except Exception as e:
-        print(e)
+    files = {
+        'image': image
+    }
+    # requests envia el archivo por partes; sin timeout un API lento bloquearia el worker
+    response = requests.post(api_url, files=files, data=data,
+                             headers=headers, timeout=settings.IMAGE_UPLOAD_TIMEOUT)
+    response.raise_for_status()
+    return response.json().get('data').get('link')
+
+
+def spool_upload(photo):
+    # Copiar el archivo subido por partes a disco en lugar de leerlo entero en memoria
+    os.makedirs(settings.IMAGE_UPLOAD_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(getattr(photo, 'name', '') or '')[1]
+    path = os.path.join(settings.IMAGE_UPLOAD_SPOOL_DIR,
+                        f'{uuid.uuid4().hex}{extension}')
+    with open(path, 'wb') as spool:
+        for chunk in photo.chunks():
+            spool.write(chunk)
+    return path
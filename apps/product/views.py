@@ -3,16 +3,28 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import permissions
 
+from core.pagination import InvalidCursor, KeysetPaginator, get_page_size
 from core.views import CustomAPIView
 from .serializers import ProductSerializer
 from .models import Product
-from apps.category.models import Category
-from django.db.models import Q
+from .search import search_products
+from apps.category.tree import descendants
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 
+def product_ordering(sort_by, order):
+    # id desempata para que el orden sea estable entre paginas
+    if order == 'desc':
+        return ['-' + sort_by, '-id']
+    return [sort_by, 'id']
+
+
 class ProductDetailView(CustomAPIView):
+    cache_control = {'public': True, 'max_age': 60}
+    cache_stamps = ('product',)
+    replica_reads = True
+
     @extend_schema(
         description="Get detail about one product",
         responses={
@@ -56,33 +68,31 @@ class ListProductsView(CustomAPIView):
 
             sortBy = request.GET.get('sortBy')
 
-            if not (sortBy == 'date_created' or sortBy == 'price' or sortBy == 'sold' or sortBy == 'name'):
+            if not (sortBy == 'date_created' or sortBy == 'price' or sortBy == 'sold' or sortBy == 'name' or sortBy == 'rating'):
                 sortBy = 'date_created'
 
             order = request.GET.get('order')
-            limit = request.GET.get('limit')
 
-            if not limit:
-                limit = 12
             try:
-                limit = int(limit)
+                limit = get_page_size(request.GET.get('limit'))
             except:
                 return Response(
                     {'error': 'Limit must be an integer'},
                     status=status.HTTP_404_NOT_FOUND)
 
-            if order == 'desc':
-                sortBy = '-' + sortBy
-                products = Product.objects.order_by(sortBy).all()[:int(limit)]
-            elif order == 'asc':
-                products = Product.objects.order_by(sortBy).all()[:int(limit)]
-            else:
-                products = Product.objects.order_by(sortBy).all()
+            paginator = KeysetPaginator(product_ordering(sortBy, order), limit)
+            try:
+                products, next_cursor = paginator.paginate(
+                    Product.objects.all(), request.GET.get('cursor'))
+            except InvalidCursor:
+                return Response(
+                    {'error': 'Invalid cursor'},
+                    status=status.HTTP_400_BAD_REQUEST)
 
             products = ProductSerializer(products, many=True)
 
             if products:
-                return Response({'products': products.data}, status=status.HTTP_200_OK)
+                return Response({'products': products.data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
             else:
                 return Response(
                     {'error': 'No products to list'},
@@ -112,10 +122,9 @@ class ListSearchView(APIView):
         if len(search) == 0:
             search_results = Product.objects.order_by('-date_created').all()
         else:
-            # Q clase para manejar consultas espaciales, en este caso que contengan en alguna parte el parametro search
-            search_results = Product.objects.filter(
-                Q(description__icontains=search) | Q(name__icontains=search)
-            )
+            # Busqueda sobre el indice de texto completo, ordenada por relevancia
+            search_results = search_products(
+                Product.objects.all(), search).order_by('-rank')
 
         if category_id == 0:
             search_results = ProductSerializer(search_results, many=True)
@@ -123,31 +132,14 @@ class ListSearchView(APIView):
                 {'search_products': search_results.data},
                 status=status.HTTP_200_OK)
 
-        if not Category.objects.filter(id=category_id).exists():
+        category_ids = descendants(category_id)
+
+        if not category_ids:
             return Response(
                 {'error': 'Category not found'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        category = Category.objects.get(id=category_id)
-
-        if category.parent:
-            search_results = search_results.filter(category=category)
-
-        else:
-            if not Category.objects.filter(parent=category).exists():
-                search_results = search_results.filter(category=category)
-
-            else:
-                categories = Category.objects.filter(parent=category)
-                filtered_categories = [category]
-
-                for cat in categories:
-                    filtered_categories.append(cat)
-
-                filtered_categories = tuple(filtered_categories)
-
-                search_results = search_results.filter(
-                    category__in=filtered_categories)
+        search_results = search_results.filter(category__in=category_ids)
 
         search_results = ProductSerializer(search_results, many=True)
         return Response({'search_products': search_results.data}, status=status.HTTP_200_OK)
@@ -182,53 +174,25 @@ class ListRelatedView(CustomAPIView):
                 {'error': 'Product ID must be an integer'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        if not Product.objects.filter(id=product_id).exists():
+        category_id = Product.objects.filter(
+            id=product_id).values_list('category_id', flat=True).first()
+
+        if category_id is None:
             return Response(
                 {'error': 'Product with this product ID does not exist'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        category = Product.objects.get(id=product_id).category
-
-        if Product.objects.filter(category=category).exists():
-            # Si la categoria tiene padrem filtrar solo por la categoria y no el padre tambien
-            if category.parent:
-                related_products = Product.objects.order_by(
-                    '-sold'
-                ).filter(category=category)
-            else:
-                if not Category.objects.filter(parent=category).exists():
-                    related_products = Product.objects.order_by(
-                        '-sold'
-                    ).filter(category=category)
-
-                else:
-                    categories = Category.objects.filter(parent=category)
-                    filtered_categories = [category]
+        # La categoria y todas sus subcategorias, a cualquier profundidad
+        related_products = Product.objects.order_by(
+            '-sold'
+        ).filter(category__in=descendants(category_id)).exclude(id=product_id)[:3]
 
-                    for cat in categories:
-                        filtered_categories.append(cat)
-
-                    filtered_categories = tuple(filtered_categories)
-                    related_products = Product.objects.order_by(
-                        '-sold'
-                    ).filter(category__in=filtered_categories)
-
-            related_products = related_products.exclude(id=product_id)
-            related_products = ProductSerializer(related_products, many=True)
-
-            if len(related_products.data) > 3:
-                return Response(
-                    {'related_products': related_products.data[:3]},
-                    status=status.HTTP_200_OK)
-            elif len(related_products.data) > 0:
-                return Response(
-                    {'related_products': related_products.data},
-                    status=status.HTTP_200_OK)
-            else:
-                return Response(
-                    {'error': 'No related products found'},
-                    status=status.HTTP_200_OK)
+        related_products = ProductSerializer(related_products, many=True)
 
+        if len(related_products.data) > 0:
+            return Response(
+                {'related_products': related_products.data},
+                status=status.HTTP_200_OK)
         else:
             return Response(
                 {'error': 'No related products found'},
@@ -238,6 +202,9 @@ class ListRelatedView(CustomAPIView):
 
 
 class ListBySearchView(CustomAPIView):
+    replica_reads = True
+    replica_stamps = ('product',)
+
     @extend_schema(
         description="Filter and retrieve products based on category, price range, sorting, and search parameters.",
         request={
@@ -246,9 +213,11 @@ class ListBySearchView(CustomAPIView):
                 "properties": {
                     "categoryId": {"type": "integer", "example": 0},
                     "priceRange": {"type": "string", "example": "100000 - 200000"},
-                    "sortBy": {"type": "string", "enum": ["date_created"], "example": ["date_created", "price", "sold", "name", "rating"]},
+                    "sortBy": {"type": "string", "enum": ["date_created"], "example": ["date_created", "price", "sold", "name", "rating", "relevance"]},
                     "order": {"type": "string", "enum": ["asc"], "example": ["asc", "desc"]},
-                    "search": {"type": "string", "description": "adidas"}
+                    "search": {"type": "string", "description": "adidas"},
+                    "limit": {"type": "integer", "example": 12},
+                    "cursor": {"type": "string", "description": "next_cursor returned by the previous page"}
                 },
                 "required": ["categoryId"]
             }
@@ -287,46 +256,40 @@ class ListBySearchView(CustomAPIView):
         price_range = data['priceRange']
         sort_by = data['sortBy']
 
-        if not (sort_by == 'date_created' or sort_by == 'price' or sort_by == 'sold' or sort_by == 'name' or sort_by == 'rating'):
-            sort_by = 'date_created'
-
         order = data['order']
 
         search = data['search']
 
+        try:
+            limit = get_page_size(data.get('limit'))
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        if sort_by == 'relevance' and len(search) == 0:
+            sort_by = 'date_created'
+        if not (sort_by == 'date_created' or sort_by == 'price' or sort_by == 'sold' or sort_by == 'name' or sort_by == 'rating' or sort_by == 'relevance'):
+            sort_by = 'date_created'
+
         if len(search) == 0:
             product_results = Product.objects.all()
         else:
-            # Q clase para manejar consultas espaciales, en este caso que contengan en alguna parte el parametro search
-            product_results = Product.objects.filter(
-                Q(description__icontains=search) | Q(name__icontains=search)
-            )
+            # Busqueda sobre el indice de texto completo (prefijos y tolerancia a errores de tipeo)
+            product_results = search_products(Product.objects.all(), search)
 
         # Si categoryID es = 0, filtrar todas las categorias
         if category_id == 0:
             product_results = product_results.all()
-        elif not Category.objects.filter(id=category_id).exists():
-            return Response(
-                {'error': 'This category does not exist'},
-                status=status.HTTP_404_NOT_FOUND)
         else:
-            category = Category.objects.get(id=category_id)
-            if category.parent:
-                # Si la categoria tiene padrem filtrar solo por la categoria y no el padre tambien
-                product_results = product_results.filter(category=category)
-            else:
-                if not Category.objects.filter(parent=category).exists():
-                    product_results = product_results.filter(category=category)
-                else:
-                    categories = Category.objects.filter(parent=category)
-                    filtered_categories = [category]
-
-                    for cat in categories:
-                        filtered_categories.append(cat)
-
-                    filtered_categories = tuple(filtered_categories)
-                    product_results = product_results.filter(
-                        category__in=filtered_categories)
+            # La categoria y todas sus subcategorias, a cualquier profundidad
+            category_ids = descendants(category_id)
+            if not category_ids:
+                return Response(
+                    {'error': 'This category does not exist'},
+                    status=status.HTTP_404_NOT_FOUND)
+            product_results = product_results.filter(
+                category__in=category_ids)
 
         # Filtrar por precio
         if not price_range or not isinstance(price_range, str):
@@ -348,20 +311,27 @@ class ListBySearchView(CustomAPIView):
             else:
                 product_results = product_results.all()
 
-        # Filtrar producto por sort_by
-        if order == 'desc':
-            sort_by = '-' + sort_by
-            product_results = product_results.order_by(sort_by)
-        elif order == 'asc':
-            product_results = product_results.order_by(sort_by)
+        # Filtrar producto por sort_by y paginar con cursor sobre (sort_by, id)
+        if sort_by == 'relevance':
+            ordering = ['-rank', 'id']
         else:
-            product_results = product_results.order_by(sort_by)
+            ordering = product_ordering(sort_by, order)
+
+        paginator = KeysetPaginator(ordering, limit)
+        try:
+            product_results, next_cursor = paginator.paginate(
+                product_results, data.get('cursor'))
+        except InvalidCursor:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST)
 
         product_results = ProductSerializer(product_results, many=True)
 
         if len(product_results.data) > 0:
             return Response(
-                {'filtered_products': product_results.data},
+                {'filtered_products': product_results.data,
+                 'next_cursor': next_cursor},
                 status=status.HTTP_200_OK)
         else:
             return Response(
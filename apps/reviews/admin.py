@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Review
+from .models import ProductRatingBucket, Review
 
 
 class ReviewAdmin(admin.ModelAdmin):
@@ -11,3 +11,13 @@ class ReviewAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Review, ReviewAdmin)
+
+
+class ProductRatingBucketAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'bucket', 'count', )
+    list_display_links = ('id', 'product', )
+    list_filter = ('bucket', )
+    list_per_page = 25
+
+
+admin.site.register(ProductRatingBucket, ProductRatingBucketAdmin)
@@ -0,0 +1,37 @@
+from core.pagination import DEFAULT_PAGE_SIZE, KeysetPaginator
+
+from .models import Review
+
+FEED_ORDERING = ['-date_created', '-id']
+
+
+def review_queryset():
+    # El nombre del autor viene en el mismo SELECT, sin una consulta por review
+    return Review.objects.select_related('user').only(
+        'id', 'product_id', 'rating', 'comment', 'date_created', 'user__first_name')
+
+
+def serialize_review(review):
+    return {
+        'id': review.id,
+        'rating': review.rating,
+        'comment': review.comment,
+        'date_created': review.date_created,
+        'user': review.user.first_name,
+    }
+
+
+def feed_paginator(limit=DEFAULT_PAGE_SIZE):
+    return KeysetPaginator(FEED_ORDERING, limit)
+
+
+def get_review_feed(product_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of a product's reviews, newest first, and the cursor of the next page."""
+    reviews, next_cursor = feed_paginator(limit).paginate(
+        review_queryset().filter(product_id=product_id), cursor)
+    return [serialize_review(review) for review in reviews], next_cursor
+
+
+def feed_cursor(review):
+    # Cursor que continua el feed justo despues de ``review``
+    return feed_paginator().encode_cursor(review)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.reviews.ratings import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute rating_sum, rating_count, rating and the rating histogram of products from their reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int,
+                            help='Only rebuild these products (default: all)')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_product_ratings(options['product_ids'] or None)
+        self.stdout.write(f'Rebuilt ratings of {rebuilt} products')
@@ -0,0 +1,32 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    updated = []
+    for row in Review.objects.values('product_id').annotate(total=Sum('rating'), count=Count('id')):
+        product = Product(pk=row['product_id'])
+        product.rating_sum = row['total']
+        product.rating_count = row['count']
+        product.rating = (Decimal(str(row['total'])) / row['count']).quantize(
+            Decimal('0.1'), rounding=ROUND_HALF_UP)
+        updated.append(product)
+    Product.objects.bulk_update(
+        updated, ['rating_sum', 'rating_count', 'rating'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0011_product_rating_aggregate'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:14
+
+import math
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def backfill_histogram(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    ProductRatingBucket = apps.get_model('reviews', 'ProductRatingBucket')
+
+    histogram = {}
+    for row in Review.objects.values('product_id', 'rating').annotate(count=Count('id')):
+        half_stars = min(max(math.ceil(Decimal(str(row['rating'])) * 2), 1), 10)
+        key = (row['product_id'], Decimal(half_stars) / 2)
+        histogram[key] = histogram.get(key, 0) + row['count']
+
+    ProductRatingBucket.objects.bulk_create([
+        ProductRatingBucket(product_id=product_id, bucket=bucket, count=count)
+        for (product_id, bucket), count in histogram.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0011_product_rating_aggregate'),
+        ('reviews', '0002_backfill_product_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRatingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DecimalField(decimal_places=1, max_digits=2)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'rating', 'date_created', 'id'], name='review_product_rating_idx'),
+        ),
+        migrations.AddField(
+            model_name='productratingbucket',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_buckets', to='product.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='productratingbucket',
+            constraint=models.UniqueConstraint(fields=('product', 'bucket'), name='unique_product_rating_bucket'),
+        ),
+        migrations.RunPython(backfill_histogram, migrations.RunPython.noop),
+    ]
@@ -13,5 +13,29 @@ class Review(models.Model):
     comment = models.TextField()
     date_created = models.DateTimeField(default=datetime.now)
 
+    class Meta:
+        indexes = [
+            # Listado filtrado por estrellas, paginado por cursor
+            models.Index(fields=['product', 'rating', 'date_created', 'id'],
+                         name='review_product_rating_idx'),
+        ]
+
     def __str__(self):
         return self.comment
+
+
+class ProductRatingBucket(models.Model):
+    # Cantidad de reviews por media estrella: bucket 4.5 cuenta los ratings en (4.0, 4.5]
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='rating_buckets')
+    bucket = models.DecimalField(max_digits=2, decimal_places=1)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'bucket'], name='unique_product_rating_bucket'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} {self.bucket}: {self.count}'
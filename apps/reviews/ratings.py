@@ -0,0 +1,115 @@
+import math
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Round
+
+from apps.product.models import Product
+from core.stamps import touch_stamp
+
+from .models import ProductRatingBucket, Review
+
+DEFAULT_RATING = Decimal('5')
+# Medias estrellas de 0.5 a 5.0
+BUCKETS = [Decimal(half) / 2 for half in range(1, 11)]
+TENTH = Decimal('0.1')
+
+
+def as_rating(value):
+    # Review.rating puede venir como float desde las vistas antes de recargarse
+    return Decimal(str(value)).quantize(TENTH, rounding=ROUND_HALF_UP)
+
+
+def average_rating(rating_sum, rating_count):
+    # Misma regla que el UPDATE de apply_rating_delta: mitad hacia arriba
+    return (as_rating(rating_sum) / rating_count).quantize(TENTH, rounding=ROUND_HALF_UP)
+
+
+def bucket_for(rating):
+    # Techo a la media estrella, limitado al rango de la escala
+    half_stars = min(max(math.ceil(as_rating(rating) * 2), 1), 10)
+    return Decimal(half_stars) / 2
+
+
+def filter_buckets(rating):
+    """Buckets that may hold reviews with ``rating - 0.5 <= review.rating <= rating``."""
+    if rating <= Decimal('0.5'):
+        return [bucket_for(rating)]
+    return [bucket_for(rating - Decimal('0.5')), bucket_for(rating)]
+
+
+def apply_bucket_delta(product_id, bucket, delta):
+    updated = ProductRatingBucket.objects.filter(
+        product_id=product_id, bucket=bucket).update(count=F('count') + delta)
+    if not updated:
+        ProductRatingBucket.objects.get_or_create(
+            product_id=product_id, bucket=bucket, defaults={'count': 0})
+        ProductRatingBucket.objects.filter(
+            product_id=product_id, bucket=bucket).update(count=F('count') + delta)
+
+
+def get_rating_histogram(product_id):
+    counts = dict(ProductRatingBucket.objects.filter(
+        product_id=product_id).values_list('bucket', 'count'))
+    return [{'rating': bucket, 'count': counts.get(bucket, 0)} for bucket in BUCKETS]
+
+
+def apply_rating_delta(product_id, rating_delta, count_delta):
+    """Shift the product's rating aggregate in a single UPDATE and derive ``rating`` from it."""
+    rating_sum = F('rating_sum') + Value(rating_delta)
+    rating_count = F('rating_count') + count_delta
+    # La suma en decimas es un entero exacto aun como REAL (SQLite): dividida por
+    # la cantidad, un .5 exacto redondea hacia arriba igual que average_rating
+    tenths = Round(rating_sum * 10)
+    # Todas las expresiones del SET leen los valores previos de la fila
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating=Case(
+            When(rating_count__gt=-count_delta, then=Round(tenths / rating_count) / 10),
+            default=Value(DEFAULT_RATING),
+            output_field=DecimalField(max_digits=3, decimal_places=1),
+        ),
+    )
+    touch_stamp('product')
+
+
+def rebuild_product_ratings(product_ids=None):
+    """Recompute the rating aggregate and histogram of ``product_ids`` (all products by default) from their reviews."""
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    reviews = Review.objects.filter(product__in=products)
+
+    totals = {
+        row['product_id']: row
+        for row in reviews.values('product_id').annotate(total=Sum('rating'), count=Count('id'))
+    }
+
+    updated = []
+    for product in products.only('id').iterator():
+        row = totals.get(product.pk)
+        product.rating_sum = row['total'] if row else Decimal('0')
+        product.rating_count = row['count'] if row else 0
+        product.rating = (
+            average_rating(product.rating_sum, product.rating_count)
+            if product.rating_count else DEFAULT_RATING
+        )
+        updated.append(product)
+
+    histogram = {}
+    for row in reviews.values('product_id', 'rating').annotate(count=Count('id')):
+        key = (row['product_id'], bucket_for(row['rating']))
+        histogram[key] = histogram.get(key, 0) + row['count']
+
+    with transaction.atomic():
+        Product.objects.bulk_update(
+            updated, ['rating_sum', 'rating_count', 'rating'], batch_size=500)
+        ProductRatingBucket.objects.filter(product__in=products).delete()
+        ProductRatingBucket.objects.bulk_create([
+            ProductRatingBucket(product_id=product_id, bucket=bucket, count=count)
+            for (product_id, bucket), count in histogram.items()
+        ], batch_size=500)
+        touch_stamp('product')
+    return len(updated)
@@ -7,3 +7,11 @@ class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = '__all__'
+
+
+class ReviewFeedSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    rating = serializers.DecimalField(max_digits=2, decimal_places=1)
+    comment = serializers.CharField()
+    date_created = serializers.DateTimeField()
+    user = serializers.CharField(help_text="First name of the author")
@@ -1,22 +1,58 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
+
+from apps.cart.snapshot import invalidate_product_carts
+from core.stamps import touch_stamp
 from .models import Review
-from apps.product.models import Product
-from django.db.models import Avg
+from .ratings import apply_bucket_delta, apply_rating_delta, as_rating, bucket_for
 
 
-@receiver([post_save, post_delete], sender=Review)
-def update_product_rating(sender, instance, **kwargs):
-    # Obtener todas las reviews del producto actual
-    product_reviews = Review.objects.filter(product=instance.product)
-
-    # Calcular el promedio de los ratings si existen reviews
-    if product_reviews.exists():
-        average_rating = product_reviews.aggregate(Avg('rating'))[
-            'rating__avg']
+@receiver(post_init, sender=Review)
+def remember_rating(sender, instance, **kwargs):
+    # Valores guardados en la base, para calcular la diferencia al editar
+    instance._saved_rating = instance.rating if instance.pk else None
+    instance._saved_product_id = instance.product_id if instance.pk else None
+
+
+@receiver(post_save, sender=Review)
+def add_product_rating(sender, instance, created, **kwargs):
+    rating = as_rating(instance.rating)
+    if created or instance._saved_rating is None:
+        apply_rating_delta(instance.product_id, rating, 1)
+        apply_bucket_delta(instance.product_id, bucket_for(rating), 1)
+    elif instance._saved_product_id != instance.product_id:
+        _remove_saved_rating(instance)
+        apply_rating_delta(instance.product_id, rating, 1)
+        apply_bucket_delta(instance.product_id, bucket_for(rating), 1)
     else:
-        average_rating = 5  # Si no hay reviews, el rating puede ser 0 o cualquier valor por defecto
+        delta = rating - as_rating(instance._saved_rating)
+        if not delta:
+            return
+        apply_rating_delta(instance.product_id, delta, 0)
+        if bucket_for(rating) != bucket_for(instance._saved_rating):
+            apply_bucket_delta(instance.product_id, bucket_for(instance._saved_rating), -1)
+            apply_bucket_delta(instance.product_id, bucket_for(rating), 1)
+
+    instance._saved_rating = rating
+    instance._saved_product_id = instance.product_id
+    # .update() no dispara las señales de Product
+    invalidate_product_carts([instance.product_id])
+
 
-    # Actualizar el rating del producto
-    instance.product.rating = average_rating
-    instance.product.save()
+def _remove_saved_rating(instance):
+    product_id = instance._saved_product_id
+    apply_rating_delta(product_id, -as_rating(instance._saved_rating), -1)
+    apply_bucket_delta(product_id, bucket_for(instance._saved_rating), -1)
+    invalidate_product_carts([product_id])
+
+
+@receiver(post_delete, sender=Review)
+def remove_product_rating(sender, instance, **kwargs):
+    if instance._saved_rating is not None:
+        _remove_saved_rating(instance)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def touch_reviews(sender, **kwargs):
+    # La lista de reviews solo lee de una replica si no cambio hace poco
+    touch_stamp('review')
@@ -1,3 +1,111 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.category.models import Category
+from apps.product.models import Product
+from .models import ProductRatingBucket, Review
+from .ratings import rebuild_product_ratings
+
+
+class RatingAggregateTest(TestCase):
+    """The incremental aggregate always equals a rebuild from the reviews."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ratings')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Product {index}', description='Product', price=10,
+                    compare_price=20, category=category)
+            for index in range(2)
+        ])
+        cls.users = [
+            get_user_model().objects.create_user(
+                email=f'reviewer{index}@example.com', password='password',
+                first_name='Review', last_name='Test')
+            for index in range(3)
+        ]
+
+    def aggregates(self):
+        products = Product.objects.order_by('id').values_list(
+            'rating', 'rating_sum', 'rating_count')
+        buckets = ProductRatingBucket.objects.filter(count__gt=0).order_by(
+            'product_id', 'bucket').values_list('product_id', 'bucket', 'count')
+        return [tuple(Decimal(value) for value in row) for row in products], list(buckets)
+
+    def assert_matches_rebuild(self, expected_rating=None):
+        incremental = self.aggregates()
+        rebuild_product_ratings()
+        self.assertEqual(incremental, self.aggregates())
+        if expected_rating is not None:
+            self.assertEqual(incremental[0][0][0], Decimal(expected_rating))
+
+    def review(self, user, rating, product=None):
+        return Review.objects.create(
+            user=user, product=product or self.products[0], rating=rating, comment='Review')
+
+    def test_half_tenths_round_up(self):
+        first, second = self.users[:2]
+        for ratings, expected in ((('4.0', '4.9'), '4.5'), (('4.0', '4.3'), '4.2'),
+                                  (('0.5', '1.0'), '0.8'), (('2.5', '3.0'), '2.8')):
+            with self.subTest(ratings=ratings):
+                self.review(first, Decimal(ratings[0]))
+                self.review(second, Decimal(ratings[1]))
+                self.assert_matches_rebuild(expected)
+                Review.objects.all().delete()
+
+    def test_create_edit_delete_and_move(self):
+        first, second, third = self.users
+        kept = self.review(first, Decimal('4.5'))
+        edited = self.review(second, Decimal('3.0'))
+        moved = self.review(third, Decimal('2.5'))
+        self.assert_matches_rebuild()
+
+        edited.rating = Decimal('1.5')
+        edited.save()
+        self.assert_matches_rebuild()
+
+        moved.product = self.products[1]
+        moved.save()
+        self.assert_matches_rebuild()
+
+        edited.delete()
+        self.assert_matches_rebuild('4.5')
+
+        kept.delete()
+        moved.delete()
+        self.assert_matches_rebuild('5')
+
+
+class FilterReviewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Filter')
+        cls.product = Product.objects.create(
+            name='Product', description='Product', price=10, compare_price=20, category=category)
+        cls.user = get_user_model().objects.create_user(
+            email='filter@example.com', password='password', first_name='Filter', last_name='Test')
+        Review.objects.create(user=cls.user, product=cls.product, rating=Decimal('4.0'),
+                              comment='Review')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, rating):
+        return self.client.get(
+            f'/api/reviews/filter-reviews/{self.product.id}', {'rating': rating})
+
+    def test_rejects_invalid_ratings(self):
+        for rating in ('nan', 'NaN', 'inf', '-inf', '5.5', '-1', 'abc'):
+            with self.subTest(rating=rating):
+                response = self.get(rating)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
 
-# Create your tests here.
+    def test_filters_by_rating(self):
+        self.assertEqual(len(self.get('4').data['reviews']), 1)
+        self.assertEqual(len(self.get('4.5').data['reviews']), 1)
+        self.assertEqual(self.get('3').data['reviews'], [])
@@ -8,4 +8,5 @@ urlpatterns = [
     path('update-review/<int:productId>', UpdateProductReviewView.as_view()),
     path('delete-review/<int:productId>', DeleteProductReviewView.as_view()),
     path('filter-reviews/<int:productId>', FilterProductReviewsView.as_view()),
+    path('rating-histogram/<int:productId>', GetRatingHistogramView.as_view()),
 ]
@@ -1,19 +1,48 @@
+from decimal import Decimal
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import permissions, status
+from rest_framework import permissions, serializers, status
 from apps.product.models import Product
-from apps.reviews.serializers import ReviewSerializer
+from apps.reviews.serializers import ReviewFeedSerializer
+from core.pagination import InvalidCursor, KeysetPaginator, get_page_size
 from core.views import AuthenticatedAPIView, CustomAPIView
-from .models import Review
-from apps.orders.models import OrderItem
+from .models import ProductRatingBucket, Review
+from .feed import feed_cursor, get_review_feed, review_queryset, serialize_review
+from .ratings import filter_buckets, get_rating_histogram
+from apps.orders.purchases import has_purchased
 from drf_spectacular.utils import extend_schema, OpenApiParameter, inline_serializer
 from drf_spectacular.types import OpenApiTypes
 
+# Respuesta comun de crear, editar y borrar una review (un solo componente en el schema)
+REVIEW_RESPONSE = inline_serializer(
+    name="ReviewResponse",
+    fields={
+        "review": ReviewFeedSerializer(),
+        "next_cursor": serializers.CharField()
+    },
+)
+
 
 class GetProductReviewsView(CustomAPIView):
+    replica_reads = True
+    replica_stamps = ('review',)
+
     @extend_schema(
-        description="Get all reviews for a product",
-        responses={200:  ReviewSerializer(many=True),
+        description="Get a page of reviews for a product, newest first",
+        parameters=[
+            OpenApiParameter(name='limit', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY,
+                             required=False, description='Page size (default 12, max 100)'),
+            OpenApiParameter(name='cursor', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY,
+                             required=False, description='next_cursor returned by the previous page'),
+        ],
+        responses={200: inline_serializer(
+            name="ReviewFeedResponse",
+            fields={
+                "reviews": ReviewFeedSerializer(many=True),
+                "next_cursor": serializers.CharField(allow_null=True),
+            },
+        ),
                    404: {
 
             "type": "object",
@@ -38,6 +67,14 @@ class GetProductReviewsView(CustomAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        try:
+            limit = get_page_size(request.query_params.get('limit'))
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             if not Product.objects.filter(id=product_id).exists():
                 return Response(
@@ -45,28 +82,17 @@ class GetProductReviewsView(CustomAPIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            product = Product.objects.get(id=product_id)
-
-            results = []
-
-            if Review.objects.filter(product=product).exists():
-                reviews = Review.objects.order_by(
-                    '-date_created'
-                ).filter(product=product)
-
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
+            try:
+                results, next_cursor = get_review_feed(
+                    product_id, request.query_params.get('cursor'), limit)
+            except InvalidCursor:
+                return Response(
+                    {'error': 'Invalid cursor'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
             return Response(
-                {'reviews': results},
+                {'reviews': results, 'next_cursor': next_cursor},
                 status=status.HTTP_200_OK
             )
 
@@ -80,7 +106,7 @@ class GetProductReviewsView(CustomAPIView):
 class GetProductReviewView(CustomAPIView):
     @extend_schema(
         description="Get review for a product",
-        responses={200:  ReviewSerializer,
+        responses={200:  ReviewFeedSerializer,
                    404: {
 
                        "type": "object",
@@ -114,18 +140,12 @@ class GetProductReviewView(CustomAPIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            product = Product.objects.get(id=product_id)
-
             result = {}
 
-            if Review.objects.filter(user=user, product=product).exists():
-                review = Review.objects.get(user=user, product=product)
-
-                result['id'] = review.id
-                result['rating'] = review.rating
-                result['comment'] = review.comment
-                result['date_created'] = review.date_created
-                result['user'] = review.user.first_name
+            review = review_queryset().filter(
+                user=user, product_id=product_id).first()
+            if review:
+                result = serialize_review(review)
 
             return Response(
                 {'review': result},
@@ -161,13 +181,7 @@ class CreateProductReviewView(AuthenticatedAPIView):
             }
         },
         responses={
-            201: inline_serializer(
-                name="ReviewResponse",
-                fields={
-                    "result": ReviewSerializer(),
-                    "reviews": ReviewSerializer(many=True)
-                },
-            ),
+            201: REVIEW_RESPONSE,
             400: {
 
                 "type": "object",
@@ -233,17 +247,13 @@ class CreateProductReviewView(AuthenticatedAPIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            product = Product.objects.get(id=productId)
-            if not OrderItem.objects.filter(order__user=user, product_id=productId).exists():
+            if not has_purchased(user, productId):
                 return Response(
                     {'error': 'You must have purchased this product to review it'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            result = {}
-            results = []
-
-            if Review.objects.filter(user=user, product=product).exists():
+            if Review.objects.filter(user=user, product_id=productId).exists():
                 return Response(
                     {'error': 'Review for this course already created'},
                     status=status.HTTP_409_CONFLICT
@@ -251,35 +261,15 @@ class CreateProductReviewView(AuthenticatedAPIView):
 
             review = Review.objects.create(
                 user=user,
-                product=product,
+                product_id=productId,
                 rating=rating,
                 comment=comment
             )
-
-            if Review.objects.filter(user=user, product=product).exists():
-                result['id'] = review.id
-                result['rating'] = review.rating
-                result['comment'] = review.comment
-                result['date_created'] = review.date_created
-                result['user'] = review.user.first_name
-
-                reviews = Review.objects.order_by('-date_created').filter(
-                    product=product
-                )
-
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
+            review = review_queryset().get(pk=review.pk)
 
             return Response(
-                {'review': result, 'reviews': results},
+                {'review': serialize_review(review),
+                 'next_cursor': feed_cursor(review)},
                 status=status.HTTP_201_CREATED
             )
         except:
@@ -311,13 +301,7 @@ class UpdateProductReviewView(AuthenticatedAPIView):
             }
         },
         responses={
-            201: inline_serializer(
-                name="ReviewResponse",
-                fields={
-                    "result": ReviewSerializer(),
-                    "reviews": ReviewSerializer(many=True)
-                },
-            ),
+            201: REVIEW_RESPONSE,
             400: {
 
                 "type": "object",
@@ -392,52 +376,22 @@ class UpdateProductReviewView(AuthenticatedAPIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            product = Product.objects.get(id=product_id)
-
-            result = {}
-            results = []
-
-            if not Review.objects.filter(user=user, product=product).exists():
+            review = review_queryset().filter(
+                user=user, product_id=product_id).first()
+            if not review:
                 return Response(
                     {'error': 'Review for this product does not exist'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            if Review.objects.filter(user=user, product=product).exists():
-
-                review = Review.objects.filter(
-                    user=user, product=product).first()
-
-                if review:
-                    review.rating = rating
-                    review.comment = comment
-                    review.save()
-
-                review = Review.objects.get(user=user, product=product)
-
-                result['id'] = review.id
-                result['rating'] = review.rating
-                result['comment'] = review.comment
-                result['date_created'] = review.date_created
-                result['user'] = review.user.first_name
-
-                reviews = Review.objects.order_by('-date_created').filter(
-                    product=product
-                )
-
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
+            review.rating = rating
+            review.comment = comment
+            review.save(update_fields=['rating', 'comment'])
+            review = review_queryset().get(pk=review.pk)
 
             return Response(
-                {'review': result, 'reviews': results},
+                {'review': serialize_review(review),
+                 'next_cursor': feed_cursor(review)},
                 status=status.HTTP_200_OK
             )
         except:
@@ -449,8 +403,8 @@ class UpdateProductReviewView(AuthenticatedAPIView):
 
 class DeleteProductReviewView(AuthenticatedAPIView):
     @extend_schema(
-        description="Get review for a product",
-        responses={200:  ReviewSerializer(many=True),
+        description="Delete the user's review for a product",
+        responses={200: REVIEW_RESPONSE,
                    **AuthenticatedAPIView.get_auth_responses(),
                    404: {
 
@@ -486,30 +440,16 @@ class DeleteProductReviewView(AuthenticatedAPIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            product = Product.objects.get(id=product_id)
-
-            results = []
-
-            if Review.objects.filter(user=user, product=product).exists():
-                Review.objects.filter(user=user, product=product).delete()
-
-                reviews = Review.objects.order_by('-date_created').filter(
-                    product=product
-                )
-
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
+            review = review_queryset().filter(
+                user=user, product_id=product_id).first()
+            if review:
+                result = serialize_review(review)
+                # El cursor es por valores, sigue siendo valido tras borrar la fila
+                next_cursor = feed_cursor(review)
+                review.delete()
 
                 return Response(
-                    {'reviews': results},
+                    {'review': result, 'next_cursor': next_cursor},
                     status=status.HTTP_200_OK
                 )
             else:
@@ -541,55 +481,69 @@ class FilterProductReviewsView(AuthenticatedAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        product = Product.objects.get(id=product_id)
-
         rating = request.query_params.get('rating')
 
         try:
-            rating = float(rating)
+            rating = Decimal(str(float(rating)))
         except:
             return Response(
                 {'error': 'Rating must be a decimal value'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # 'nan' e 'inf' pasan por float() pero no sirven para elegir la franja
+        if not rating.is_finite() or not 0 <= rating <= 5:
+            return Response(
+                {'error': 'Rating must be between 0 and 5'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = get_page_size(request.query_params.get('limit'))
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             if not rating:
-                rating = 5.0
-            elif rating > 5.0:
-                rating = 5.0
-            elif rating < 0.5:
-                rating = 0.5
+                rating = Decimal('5.0')
+            elif rating < Decimal('0.5'):
+                rating = Decimal('0.5')
 
             results = []
-
-            if Review.objects.filter(product=product).exists():
-                if rating == 0.5:
-                    reviews = Review.objects.order_by('-date_created').filter(
-                        rating=rating, product=product
+            next_cursor = None
+
+            # El histograma evita consultar las reviews cuando la franja esta vacia
+            if ProductRatingBucket.objects.filter(
+                    product_id=product_id, bucket__in=filter_buckets(rating), count__gt=0).exists():
+                if rating == Decimal('0.5'):
+                    reviews = review_queryset().filter(
+                        rating=rating, product_id=product_id
                     )
                 else:
-                    reviews = Review.objects.order_by('-date_created').filter(
+                    reviews = review_queryset().filter(
                         rating__lte=rating,
-                        product=product
-                    ).filter(
-                        rating__gte=(rating - 0.5),
-                        product=product
+                        rating__gte=(rating - Decimal('0.5')),
+                        product_id=product_id
                     )
 
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
+                paginator = KeysetPaginator(
+                    ['-rating', '-date_created', '-id'], limit)
+                try:
+                    reviews, next_cursor = paginator.paginate(
+                        reviews, request.query_params.get('cursor'))
+                except InvalidCursor:
+                    return Response(
+                        {'error': 'Invalid cursor'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-                    results.append(item)
+                results = [serialize_review(review) for review in reviews]
 
             return Response(
-                {'reviews': results},
+                {'reviews': results, 'next_cursor': next_cursor},
                 status=status.HTTP_200_OK
             )
         except:
@@ -597,3 +551,57 @@ class FilterProductReviewsView(AuthenticatedAPIView):
                 {'error': 'Something went wrong when filtering reviews for product'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class GetRatingHistogramView(CustomAPIView):
+    @extend_schema(
+        description="Get how many reviews a product has for each half star, for the rating breakdown widget",
+        responses={
+            200: inline_serializer(
+                name="RatingHistogramResponse",
+                fields={
+                    "rating": serializers.DecimalField(max_digits=3, decimal_places=1),
+                    "total": serializers.IntegerField(),
+                    "histogram": inline_serializer(
+                        name="RatingBucket",
+                        fields={
+                            "rating": serializers.DecimalField(max_digits=2, decimal_places=1),
+                            "count": serializers.IntegerField(),
+                        },
+                        many=True,
+                    ),
+                },
+            ),
+            404: {
+                "type": "object",
+                "properties": {
+                    "error": {"type": "string"}
+                },
+                "example": {"error": "This product does not exist"}
+            },
+            **CustomAPIView.get_500_errors(),
+        },
+    )
+    def get(self, request, productId, format=None):
+        try:
+            product = Product.objects.filter(id=productId).values(
+                'rating', 'rating_count').first()
+            if product is None:
+                return Response(
+                    {'error': 'This product does not exist'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            return Response(
+                {
+                    'rating': product['rating'],
+                    'total': product['rating_count'],
+                    'histogram': get_rating_histogram(productId),
+                },
+                status=status.HTTP_200_OK
+            )
+        except:
+            return Response(
+                {'error': 'Something went wrong when retrieving the rating histogram'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.stamps import touch_stamp
+from .models import Shipping
+
+
+@receiver([post_save, post_delete], sender=Shipping)
+def touch_shipping_stamp(sender, instance, **kwargs):
+    touch_stamp('shipping')
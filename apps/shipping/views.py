@@ -9,6 +9,9 @@ from drf_spectacular.utils import extend_schema
 
 
 class GetShippingView(CustomAPIView):
+    cache_control = {'public': True, 'max_age': 300}
+    cache_stamps = ('shipping',)
+    replica_reads = True
 
     @extend_schema(
         description="Get all available shipping options.",
@@ -0,0 +1,20 @@
+from apps.product.serializers import ProductSerializer
+from .models import WishListItem
+
+
+def get_wishlist_items(user):
+    # Un solo query: items de la wishlist con su producto (JOIN)
+    return list(
+        WishListItem.objects.filter(wishlist__user=user)
+        .select_related('product')
+        .order_by('id')
+    )
+
+
+def serialize_wishlist_items(wishlist_items):
+    products = ProductSerializer(
+        [wishlist_item.product for wishlist_item in wishlist_items], many=True).data
+    return [
+        {'id': wishlist_item.id, 'product': product}
+        for wishlist_item, product in zip(wishlist_items, products)
+    ]
@@ -1,12 +1,15 @@
+from django.db import transaction
+from django.db.models import F
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from apps.cart.models import Cart, CartItem
+from apps.cart.versions import bump_cart, cart_change
 from apps.wishlist.serializers import WishListItemSerializer
 from core.views import AuthenticatedAPIView
 from .models import WishList, WishListItem
+from .repository import get_wishlist_items, serialize_wishlist_items
 from apps.product.models import Product
-from apps.product.serializers import ProductSerializer
 from drf_spectacular.utils import extend_schema, OpenApiParameter, inline_serializer
 from drf_spectacular.types import OpenApiTypes
 
@@ -34,18 +37,7 @@ class GetItemsView(AuthenticatedAPIView):
         user = self.request.user
 
         try:
-            wishlist = WishList.objects.get(user=user)
-            wishlist_items = WishListItem.objects.filter(wishlist=wishlist)
-            result = []
-
-            if WishListItem.objects.filter(wishlist=wishlist).exists():
-                for wishlist_item in wishlist_items:
-                    item = {}
-                    item['id'] = wishlist_item.id
-                    product = Product.objects.get(id=wishlist_item.product.id)
-                    product = ProductSerializer(product)
-                    item['product'] = product.data
-                    result.append(item)
+            result = serialize_wishlist_items(get_wishlist_items(user))
             return Response(
                 {'wishlist': result},
                 status=status.HTTP_200_OK
@@ -124,45 +116,26 @@ class AddItemView(AuthenticatedAPIView):
                     status=status.HTTP_409_CONFLICT
                 )
 
-            WishListItem.objects.create(
-                product=product,
-                wishlist=wishlist
-            )
-
-            if WishListItem.objects.filter(product=product, wishlist=wishlist).exists():
-                total_items = int(wishlist.total_items) + 1
-                WishList.objects.filter(user=user).update(
-                    total_items=total_items
+            with transaction.atomic():
+                WishListItem.objects.create(
+                    product=product,
+                    wishlist=wishlist
+                )
+                WishList.objects.filter(pk=wishlist.pk).update(
+                    total_items=F('total_items') + 1
                 )
 
+                # Si estaba en el carrito pasa a la wishlist
                 cart = Cart.objects.get(user=user)
-
-                if CartItem.objects.filter(cart=cart, product=product).exists():
-                    CartItem.objects.filter(
+                with cart_change(cart.id, atomic=False):
+                    deleted, _ = CartItem.objects.filter(
                         cart=cart,
                         product=product
                     ).delete()
+                    if deleted:
+                        bump_cart(cart.id, items_delta=-deleted)
 
-                    if not CartItem.objects.filter(cart=cart, product=product).exists():
-                        # actualizar items totales ene l carrito
-                        total_items = int(cart.total_items) - 1
-                        Cart.objects.filter(user=user).update(
-                            total_items=total_items
-                        )
-
-            wishlist_items = WishListItem.objects.filter(wishlist=wishlist)
-            result = []
-
-            for wishlist_item in wishlist_items:
-                item = {}
-
-                item['id'] = wishlist_item.id
-                product = Product.objects.get(id=wishlist_item.product.id)
-                product = ProductSerializer(product)
-
-                item['product'] = product.data
-
-                result.append(item)
+            result = serialize_wishlist_items(get_wishlist_items(user))
 
             return Response(
                 {'wishlist': result},
@@ -269,33 +242,16 @@ class RemoveItemView(AuthenticatedAPIView):
                     {'error': 'This product is not in your wishlist'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            WishListItem.objects.filter(
+            deleted, _ = WishListItem.objects.filter(
                 wishlist=wishlist,
                 product=product
             ).delete()
+            # Actualizar el total de items en el wishlist
+            WishList.objects.filter(pk=wishlist.pk).update(
+                total_items=F('total_items') - deleted
+            )
 
-            if not WishListItem.objects.filter(wishlist=wishlist, product=product).exists():
-                # Actualiizar el total de items en el wishlist
-                total_items = int(wishlist.total_items) - 1
-                WishList.objects.filter(user=user).update(
-                    total_items=total_items
-                )
-
-            wishlist_items = WishListItem.objects.filter(wishlist=wishlist)
-
-            result = []
-
-            if WishListItem.objects.filter(wishlist=wishlist).exists():
-                for wishlist_item in wishlist_items:
-                    item = {}
-
-                    item['id'] = wishlist_item.id
-                    product = Product.objects.get(id=wishlist_item.product.id)
-                    product = ProductSerializer(product)
-
-                    item['product'] = product.data
-
-                    result.append(item)
+            result = serialize_wishlist_items(get_wishlist_items(user))
 
             return Response(
                 {'wishlist': result},
@@ -0,0 +1,85 @@
+"""Query counts and latency of every API route on a realistic catalog.
+
+Run from the project root with the usual environment variables::
+
+    python -m bench.budgets [--products 2000] [--repeat 5] [--only cart]
+
+A throwaway test database is created and seeded (see ``bench.fixtures``).
+Every route in ``bench.routes`` is requested with a cold cache. Exits with
+status 1 if a route goes over its query or latency budget or returns an
+unexpected status. Latency limits are multiplied by ``BENCH_LATENCY_SCALE``.
+The same budgets are enforced by the test suite (``python manage.py test bench``).
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Sin muestreo de metricas: no debe sumar ruido a los tiempos medidos
+os.environ.setdefault('METRICS_SAMPLE_RATE', '0')
+# Los defaults datetime.now de algunos modelos avisan en cada fila creada
+warnings.filterwarnings('ignore', message='DateTimeField .* received a naive datetime')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test.utils import (  # noqa: E402
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment)
+
+from . import fixtures  # noqa: E402
+from .routes import BUDGETS, LATENCY_SCALE, measure, warm_up  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='requests per read-only route; the median time is reported')
+    parser.add_argument('--only', default='',
+                        help='only routes containing this text')
+    args = parser.parse_args(argv)
+
+    failures = []
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        start = time.perf_counter()
+        fx = fixtures.seed(products=args.products)
+        print(f'Seeded {args.products} products in {time.perf_counter() - start:.1f}s\n')
+        warm_up()
+
+        print(f'{"route":<48} {"method":<7} {"status":>6} {"queries":>9} {"median ms":>14}')
+        for budget in BUDGETS:
+            if args.only not in budget.route:
+                continue
+            response, queries, ms = measure(budget, fx, args.repeat)
+            limit = budget.ms * LATENCY_SCALE
+            marks = []
+            if response.status_code != budget.status:
+                marks.append(f'status {response.status_code} != {budget.status}')
+            if queries > budget.queries:
+                marks.append(f'{queries} queries > {budget.queries}')
+            if ms > limit:
+                marks.append(f'{ms:.1f} ms > {limit:.0f}')
+            failures += [f'{budget.route}: {mark}' for mark in marks]
+            print(f'{budget.route:<48} {budget.method.upper():<7} {response.status_code:>6} '
+                  f'{queries:>4}/{budget.queries:<4} {ms:>8.1f}/{limit:<5.0f}'
+                  f'{"  FAIL" if marks else ""}')
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    if failures:
+        print('\nBudget failures:')
+        for failure in failures:
+            print(f'  {failure}')
+        return 1
+    print('\nAll routes within budget')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from apps.cart.models import Cart, CartItem
+from apps.category.models import Category
+from apps.coupons.models import FixedPriceCoupon, PercentageCoupon
+from apps.orders.models import Order, OrderItem
+from apps.orders.purchases import record_purchases
+from apps.product.models import Product
+from apps.product.search import SEARCH_VECTOR, uses_postgres
+from apps.reviews.models import Review
+from apps.reviews.ratings import rebuild_product_ratings
+from apps.shipping.models import Shipping
+from apps.wishlist.models import WishList, WishListItem
+
+CART_SIZE = 50
+PASSWORD = 'bench-password'
+
+
+def _category_tree(roots, depth, fanout):
+    # Arbol completo: roots * fanout^(depth-1) hojas
+    level = [Category.objects.create(name=f'Category {index}') for index in range(roots)]
+    leaves = level
+    for depth_index in range(1, depth):
+        leaves = []
+        for parent in level:
+            for index in range(fanout):
+                leaves.append(Category.objects.create(
+                    name=f'{parent.name}.{index}', parent=parent))
+        level = leaves
+    return leaves
+
+
+def _user(email, **extra):
+    return get_user_model().objects.create_user(
+        email=email, password=PASSWORD, first_name='Bench', last_name='User', **extra)
+
+
+def _fill_cart(user, products):
+    cart = Cart.objects.get(user=user)
+    CartItem.objects.bulk_create(
+        [CartItem(cart=cart, product=product, count=1) for product in products])
+    Cart.objects.filter(pk=cart.pk).update(total_items=len(products))
+
+
+def _fill_wishlist(user, products):
+    wishlist = WishList.objects.get(user=user)
+    WishListItem.objects.bulk_create(
+        [WishListItem(wishlist=wishlist, product=product) for product in products])
+    WishList.objects.filter(pk=wishlist.pk).update(total_items=len(products))
+
+
+def seed(products=2000, reviews_per_product=8, seed_value=7, cart_size=CART_SIZE):
+    """Fill the current database with a realistic catalog and the users the budgets run as.
+
+    Carts and wishlists hold ``cart_size`` products; ``products`` must be at least
+    ``max(200, 3 * cart_size + 1)``.
+    """
+    rng = random.Random(seed_value)
+
+    leaves = _category_tree(roots=4, depth=4, fanout=3)
+    catalog = Product.objects.bulk_create([
+        Product(
+            name=f'Product {index} {rng.choice(["blue", "red", "black", "white"])}',
+            description=f'Bench product number {index} with a longer description to search',
+            price=Decimal(rng.randint(10, 900)),
+            compare_price=Decimal(rng.randint(900, 1200)),
+            category=leaves[index % len(leaves)],
+            quantity=1000,
+            sold=rng.randint(0, 500),
+        )
+        for index in range(products)
+    ], batch_size=500)
+    if uses_postgres():
+        # bulk_create no pasa por la señal que indexa la busqueda
+        Product.objects.update(search_vector=SEARCH_VECTOR)
+
+    shipping = Shipping.objects.bulk_create([
+        Shipping(name=name, time_to_delivery=time, price=price)
+        for name, time, price in (('Standard', '5-7 days', 5), ('Express', '1-2 days', 15))
+    ])
+    FixedPriceCoupon.objects.create(name='BENCH10', discount_price=10)
+    PercentageCoupon.objects.create(name='BENCHPCT', discount_percentage=15)
+
+    shopper = _user('shopper@bench.local')
+    # Carritos separados para que las mutaciones no afecten a las lecturas
+    mutator = _user('mutator@bench.local')
+    buyer = _user('buyer@bench.local')
+    # Paga con el quote_token de payment-total
+    payer = _user('payer@bench.local')
+    admin = _user('admin@bench.local', is_staff=True)
+    reviewers = [_user(f'reviewer{index}@bench.local') for index in range(reviews_per_product)]
+
+    cart_products = catalog[:cart_size]
+    for user in (shopper, mutator, buyer, payer):
+        _fill_cart(user, cart_products)
+    _fill_wishlist(shopper, catalog[:cart_size])
+    _fill_wishlist(mutator, catalog[:cart_size])
+
+    # Las reviews van en bloque y los agregados se recalculan al final
+    reviewed = catalog[:200]
+    now = timezone.now()
+    Review.objects.bulk_create([
+        Review(
+            user=reviewer,
+            product=product,
+            rating=Decimal(rng.randint(1, 10)) / 2,
+            comment=f'Review of {product.name}',
+            date_created=now - timedelta(minutes=index),
+        )
+        for product in reviewed
+        for index, reviewer in enumerate(reviewers)
+    ], batch_size=500)
+    rebuild_product_ratings([product.pk for product in reviewed])
+
+    order = Order.objects.create(
+        user=shopper,
+        transaction_id='1001',
+        amount=1000,
+        full_name='Bench User',
+        address_line_1='Street 1',
+        city='Bogota',
+        state_province_region='Cundinamarca',
+        postal_zip_code='110111',
+        telephone_number='3000000000',
+        shipping_name=shipping[0].name,
+        shipping_time=shipping[0].time_to_delivery,
+        shipping_price=shipping[0].price,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(product=product, order=order, name=product.name, price=product.price, count=1)
+        for product in cart_products
+    ])
+    record_purchases(shopper, [product.pk for product in cart_products], now)
+    record_purchases(mutator, [product.pk for product in catalog[:cart_size * 2]], now)
+    # mutator ya tiene una review para poder editarla y borrarla
+    Review.objects.create(user=mutator, product=catalog[cart_size], rating=4, comment='Editable')
+
+    return SimpleNamespace(
+        products=catalog,
+        product=reviewed[0],
+        cart_products=cart_products,
+        outside_cart=catalog[cart_size * 3],
+        review_target=catalog[cart_size + 1],
+        edited_review_product=catalog[cart_size],
+        category=leaves[0].parent.parent.parent,
+        shipping=shipping[0],
+        order=order,
+        shopper=shopper,
+        mutator=mutator,
+        buyer=buyer,
+        payer=payer,
+        admin=admin,
+    )
@@ -0,0 +1,16 @@
+# Configuracion de gunicorn para las pruebas de carga:
+#   gunicorn -c bench/gunicorn.conf.py core.wsgi
+import multiprocessing
+import os
+
+bind = os.environ.get('BENCH_BIND', '127.0.0.1:8000')
+# Con SQLite conviene 1 worker: las escrituras concurrentes se bloquean entre procesos
+workers = int(os.environ.get('BENCH_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('BENCH_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('BENCH_TIMEOUT', 30))
+keepalive = 5
+# Sin access log: escribir cada linea distorsiona los tiempos medidos
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('BENCH_LOG_LEVEL', 'warning')
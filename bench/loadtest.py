@@ -0,0 +1,342 @@
+"""Concurrent user journeys against a running server, with per-step statistics.
+
+    # Todo en local: stubs, base SQLite nueva, gunicorn y la carga
+    python -m bench.loadtest stack --users 20 --duration 60
+
+    # Contra un servidor ya levantado (usuarios creados con `seed`)
+    python -m bench.loadtest seed --users 20
+    python -m bench.loadtest run --base-url http://127.0.0.1:8000 --users 20 --duration 60
+
+Each virtual user logs in and loops over: browse products, product detail,
+add to cart, payment-total, make-payment and post a review. ``--json-out``
+saves the report and ``--baseline`` compares against a saved one.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+PASSWORD = 'bench-password'
+STEPS = ['login', 'browse', 'detail', 'add_to_cart', 'payment_total', 'make_payment', 'review']
+# 409: ya estaba en el carrito / ya tenia review (esperable al repetir corridas)
+OK_STATUSES = {
+    'login': {200},
+    'browse': {200},
+    'detail': {200},
+    'add_to_cart': {200, 409},
+    'payment_total': {200},
+    'make_payment': {200},
+    'review': {201, 409},
+}
+CHECKOUT = {
+    'coupon_name': '',
+    'full_name': 'Load User',
+    'address_line_1': 'Street 1',
+    'address_line_2': '',
+    'city': 'Bogota',
+    'state_province_region': 'Cundinamarca',
+    'postal_zip_code': '110111',
+    'country_region': 'Colombia',
+    'telephone_number': '3000000000',
+}
+
+
+def user_email(index):
+    return f'load{index}@bench.local'
+
+
+def _percentile(ordered, percent):
+    index = max(0, min(len(ordered) - 1, -(-len(ordered) * percent // 100) - 1))
+    return ordered[index]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def record(self, step, status, ms):
+        with self.lock:
+            self.latencies[step].append(ms)
+            self.statuses[step][status] += 1
+            if status not in OK_STATUSES[step]:
+                self.errors[step] += 1
+
+    def report(self, elapsed):
+        report = {}
+        for step in STEPS:
+            latencies = sorted(self.latencies.get(step, ()))
+            if not latencies:
+                continue
+            report[step] = {
+                'requests': len(latencies),
+                'rps': round(len(latencies) / elapsed, 2),
+                'error_rate': round(self.errors[step] / len(latencies), 4),
+                'p50_ms': round(_percentile(latencies, 50), 1),
+                'p95_ms': round(_percentile(latencies, 95), 1),
+                'p99_ms': round(_percentile(latencies, 99), 1),
+                'max_ms': round(latencies[-1], 1),
+                'statuses': {str(status): count for status, count in sorted(
+                    self.statuses[step].items(), key=lambda item: str(item[0]))},
+            }
+        return report
+
+
+class VirtualUser:
+    def __init__(self, base_url, email, stats, shipping_id, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.stats = stats
+        self.shipping_id = shipping_id
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.rng = random.Random(email)
+
+    def call(self, step, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        self.stats.record(step, status, (time.perf_counter() - start) * 1000)
+        if response is not None and status in OK_STATUSES[step]:
+            return response
+        return None
+
+    def login(self):
+        response = self.call('login', 'post', '/auth/jwt/create/',
+                             json={'email': self.email, 'password': PASSWORD})
+        if response is None:
+            return False
+        self.session.headers['Authorization'] = f'JWT {response.json()["access"]}'
+        return True
+
+    def journey(self):
+        response = self.call('browse', 'post', '/api/product/products', json={
+            'categoryId': 0,
+            'priceRange': '',
+            'sortBy': self.rng.choice(['sold', 'price', 'date_created']),
+            'order': self.rng.choice(['asc', 'desc']),
+            'search': self.rng.choice(['', '', 'blue', 'red']),
+        })
+        if response is None:
+            return
+        products = response.json().get('filtered_products') or []
+        if not products:
+            return
+        product_id = self.rng.choice(products)['id']
+
+        if self.call('detail', 'get', f'/api/product/{product_id}') is None:
+            return
+        if self.call('add_to_cart', 'post', '/api/cart/add-item',
+                     json={'product_id': product_id}) is None:
+            return
+
+        response = self.call('payment_total', 'get', '/api/payment/payment-total',
+                             params={'shipping_id': self.shipping_id})
+        if response is None:
+            return
+        checkout = dict(CHECKOUT, shipping_id=self.shipping_id,
+                        quote_token=response.json().get('quote_token'))
+        if self.call('make_payment', 'post', '/api/payment/make-payment', json=checkout) is None:
+            return
+
+        self.call('review', 'post', f'/api/reviews/create-review/{product_id}', json={
+            'rating': self.rng.choice([3, 3.5, 4, 4.5, 5]),
+            'comment': 'Load test review',
+        })
+
+    def run(self, deadline, think_time):
+        if not self.login():
+            return
+        while time.monotonic() < deadline:
+            self.journey()
+            if think_time:
+                time.sleep(self.rng.uniform(0, think_time))
+
+
+def run_load(base_url, users, duration, ramp_up, think_time, shipping_id, timeout):
+    stats = Stats()
+    start = time.monotonic()
+    deadline = start + duration
+    threads = []
+    for index in range(users):
+        user = VirtualUser(base_url, user_email(index), stats, shipping_id, timeout)
+        thread = threading.Thread(target=user.run, args=(deadline, think_time), daemon=True)
+        thread.start()
+        threads.append(thread)
+        if ramp_up:
+            time.sleep(ramp_up / users)
+    for thread in threads:
+        thread.join()
+    return stats.report(time.monotonic() - start)
+
+
+def print_report(report, baseline=None):
+    print(f'\n{"step":<15} {"req":>7} {"rps":>8} {"errors":>7} {"p50":>8} {"p95":>8} '
+          f'{"p99":>8} {"max":>8}  statuses')
+    for step, row in report.items():
+        line = (f'{step:<15} {row["requests"]:>7} {row["rps"]:>8.1f} {row["error_rate"]:>7.1%} '
+                f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f} '
+                f'{row["max_ms"]:>8.1f}  {row["statuses"]}')
+        previous = (baseline or {}).get(step)
+        if previous:
+            line += (f'  (p95 {row["p95_ms"] - previous["p95_ms"]:+.1f}ms, '
+                     f'rps {row["rps"] - previous["rps"]:+.1f})')
+        print(line)
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+
+def seed(users, products):
+    """Create the catalog (when the database has none) and the load users."""
+    setup_django()
+    from django.contrib.auth import get_user_model
+
+    from apps.product.models import Product
+    from apps.shipping.models import Shipping
+
+    from . import fixtures
+
+    if not Product.objects.exists():
+        fixtures.seed(products=products)
+    User = get_user_model()
+    for index in range(users):
+        if not User.objects.filter(email=user_email(index)).exists():
+            User.objects.create_user(
+                email=user_email(index), password=PASSWORD,
+                first_name='Load', last_name=str(index))
+    return Shipping.objects.order_by('id').values_list('id', flat=True).first()
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'{url} did not come up in {timeout}s')
+
+
+def stack(args):
+    from .stubs import ImgurStub, SmtpSink, start
+
+    smtp = start(SmtpSink(('127.0.0.1', args.smtp_port)))
+    imgur = start(ImgurStub(('127.0.0.1', args.imgur_port)))
+    database_url = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='loadtest-'), 'db.sqlite3')
+    env = dict(
+        os.environ,
+        DEPLOY_DATABASE_URL=database_url,
+        ALLOWED_HOSTS=' '.join(filter(None, [os.environ.get('ALLOWED_HOSTS'), '127.0.0.1'])),
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='127.0.0.1',
+        EMAIL_PORT=str(args.smtp_port),
+        EMAIL_USE_TLS='False',
+        IMAGE_UPLOAD_URL=f'http://127.0.0.1:{args.imgur_port}/3/image',
+        BENCH_BIND=f'127.0.0.1:{args.port}',
+        BENCH_WORKERS=str(args.workers),
+        METRICS_SAMPLE_RATE=os.environ.get('METRICS_SAMPLE_RATE', '0'),
+    )
+    manage = [sys.executable, 'manage.py']
+    print(f'Database: {database_url}')
+    subprocess.run(manage + ['migrate', '--verbosity', '0'], env=env, check=True)
+    shipping_id = subprocess.run(
+        [sys.executable, '-m', 'bench.loadtest', 'seed', '--users', str(args.users),
+         '--products', str(args.products)],
+        env=env, check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1]
+
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'bench/gunicorn.conf.py', 'core.wsgi'], env=env)
+    base_url = f'http://127.0.0.1:{args.port}'
+    try:
+        wait_for(base_url + '/ping/')
+        report = run_load(base_url, args.users, args.duration, args.ramp_up,
+                          args.think_time, shipping_id, args.timeout)
+    finally:
+        server.terminate()
+        server.wait()
+
+    # Los correos de checkout salen por la cola hacia el SMTP sink
+    subprocess.run(manage + ['send_queued_emails'], env=env, check=True, stdout=subprocess.DEVNULL)
+    print(f'\nSMTP sink received {smtp.messages} emails; Imgur stub got {imgur.uploads} uploads')
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='create the catalog and load users')
+    seed_parser.add_argument('--users', type=int, default=20)
+    seed_parser.add_argument('--products', type=int, default=2000)
+
+    for name in ('run', 'stack'):
+        command = commands.add_parser(name)
+        command.add_argument('--users', type=int, default=20)
+        command.add_argument('--duration', type=float, default=60, help='seconds')
+        command.add_argument('--ramp-up', type=float, default=5,
+                             help='seconds to start all the users')
+        command.add_argument('--think-time', type=float, default=0,
+                             help='max random pause between journeys, in seconds')
+        command.add_argument('--timeout', type=float, default=30)
+        command.add_argument('--json-out', help='save the report to this file')
+        command.add_argument('--baseline', help='report saved with --json-out to compare with')
+
+    commands.choices['run'].add_argument('--base-url', default='http://127.0.0.1:8000')
+    commands.choices['run'].add_argument('--shipping-id', type=int, required=True)
+
+    stack_parser = commands.choices['stack']
+    stack_parser.add_argument('--products', type=int, default=2000)
+    stack_parser.add_argument('--database-url',
+                              help='defaults to a new SQLite file; use a Postgres URL to match production')
+    stack_parser.add_argument('--workers', type=int, default=1)
+    stack_parser.add_argument('--port', type=int, default=8000)
+    stack_parser.add_argument('--smtp-port', type=int, default=2525)
+    stack_parser.add_argument('--imgur-port', type=int, default=8025)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'seed':
+        # La ultima linea es el id de envio que usa `run`
+        print(seed(args.users, args.products))
+        return 0
+
+    if args.command == 'stack':
+        report = stack(args)
+    else:
+        report = run_load(args.base_url, args.users, args.duration, args.ramp_up,
+                          args.think_time, args.shipping_id, args.timeout)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(report, baseline)
+    if args.json_out:
+        with open(args.json_out, 'w') as out:
+            json.dump(report, out, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Every API route with the request that exercises it and its query and latency budget.
+
+Shared by the budget tests (``bench.tests``) and the report
+(``python -m bench.budgets``); import it once Django is set up.
+"""
+import os
+import statistics
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from django.core.cache import cache
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.coupons.resolver import resolver as coupon_resolver
+from core.middleware import QueryTimer
+
+# Los limites de latencia son holgados (un orden de magnitud sobre lo medido):
+# detectan un N+1 o un recorrido del catalogo, no el ruido de la maquina.
+# En maquinas lentas (CI compartido) BENCH_LATENCY_SCALE los multiplica
+LATENCY_SCALE = float(os.environ.get('BENCH_LATENCY_SCALE', '1'))
+
+
+@dataclass
+class Budget:
+    # Ruta tal como la arma el resolver, p. ej. 'api/cart/remove-item/<productId>'
+    route: str
+    method: str
+    path: Callable
+    queries: int
+    # Mediana en ms con el catalogo de bench.fixtures, antes de LATENCY_SCALE
+    ms: float = 250
+    user: Optional[str] = None
+    data: Optional[Callable] = None
+    status: int = 200
+    # Las mutaciones se miden una sola vez para no cambiar los datos entre corridas
+    repeat: bool = True
+    params: dict = field(default_factory=dict)
+
+
+def checkout(fx):
+    return {
+        'shipping_id': fx.shipping.id,
+        'coupon_name': 'BENCH10',
+        'full_name': 'Bench User',
+        'address_line_1': 'Street 1',
+        'address_line_2': '',
+        'city': 'Bogota',
+        'state_province_region': 'Cundinamarca',
+        'postal_zip_code': '110111',
+        'country_region': 'Colombia',
+        'telephone_number': '3000000000',
+    }
+
+
+def checkout_with_quote(fx):
+    # El token sale de payment-total antes de medir, como en el flujo del frontend
+    response = client_for(fx, 'payer').get(
+        '/api/payment/payment-total', {'shipping_id': fx.shipping.id, 'coupon_name': 'BENCH10'})
+    return {**checkout(fx), 'quote_token': response.data['quote_token']}
+
+
+def product_search(fx):
+    return {
+        'categoryId': fx.category.id,
+        'priceRange': '100 - 500',
+        'sortBy': 'price',
+        'order': 'desc',
+        'search': 'blue',
+    }
+
+
+# El orden importa: las mutaciones de cada usuario van despues de sus lecturas.
+# Ningun limite depende del tamaño del carrito o la wishlist (bench.tests lo verifica)
+BUDGETS = [
+    Budget('ping/', 'get', lambda fx: '/ping/', queries=0),
+    Budget('metrics/', 'get', lambda fx: '/metrics/', queries=1, user='admin'),
+    # Genera el esquema OpenAPI completo en cada peticion
+    Budget('api/schema/', 'get', lambda fx: '/api/schema/', queries=0, ms=3000),
+    Budget('api/schema/swagger-ui/', 'get', lambda fx: '/api/schema/swagger-ui/', queries=0),
+    Budget('api/schema/redoc/', 'get', lambda fx: '/api/schema/redoc/', queries=0),
+
+    Budget('api/product/products', 'post', lambda fx: '/api/product/products',
+           data=product_search, queries=3, ms=1000),
+    Budget('api/product/related/<int:productId>', 'get',
+           lambda fx: f'/api/product/related/{fx.product.id}', queries=3),
+    Budget('api/product/<int:productId>', 'get',
+           lambda fx: f'/api/product/{fx.product.id}', queries=2),
+    Budget('api/category/categories', 'get', lambda fx: '/api/category/categories',
+           queries=1),
+    Budget('api/shipping/shipping-options', 'get', lambda fx: '/api/shipping/shipping-options',
+           queries=2),
+    Budget('api/coupons/check-coupon', 'get', lambda fx: '/api/coupons/check-coupon',
+           params={'coupon_name': 'bench10'}, queries=1),
+    Budget('api/orders/countries', 'get', lambda fx: '/api/orders/countries', queries=0),
+
+    Budget('api/reviews/get-reviews/<int:productId>', 'get',
+           lambda fx: f'/api/reviews/get-reviews/{fx.product.id}', queries=2),
+    Budget('api/reviews/filter-reviews/<int:productId>', 'get',
+           lambda fx: f'/api/reviews/filter-reviews/{fx.product.id}',
+           params={'rating': '4'}, user='shopper', queries=4),
+    Budget('api/reviews/rating-histogram/<int:productId>', 'get',
+           lambda fx: f'/api/reviews/rating-histogram/{fx.product.id}', queries=2),
+
+    Budget('api/cart/cart-items', 'get', lambda fx: '/api/cart/cart-items',
+           user='shopper', queries=3),
+    Budget('api/cart/total', 'get', lambda fx: '/api/cart/total',
+           user='shopper', queries=3),
+    Budget('api/cart/total-items', 'get', lambda fx: '/api/cart/total-items',
+           user='shopper', queries=3),
+    Budget('api/wishlist/', 'get', lambda fx: '/api/wishlist/',
+           user='shopper', queries=2),
+    Budget('api/wishlist/exist-item/<int:productId>', 'get',
+           lambda fx: f'/api/wishlist/exist-item/{fx.cart_products[0].id}',
+           user='shopper', queries=3),
+    Budget('api/orders/', 'get', lambda fx: '/api/orders/',
+           user='shopper', queries=2),
+    Budget('api/orders/<int:transactionId>/detail', 'get',
+           lambda fx: f'/api/orders/{fx.order.transaction_id}/detail',
+           user='shopper', queries=4),
+    Budget('api/reviews/get-review/<int:productId>', 'get',
+           lambda fx: f'/api/reviews/get-review/{fx.edited_review_product.id}',
+           user='mutator', queries=3),
+    Budget('api/payment/token', 'get', lambda fx: '/api/payment/token',
+           user='buyer', queries=1),
+    Budget('api/payment/payment-total', 'get', lambda fx: '/api/payment/payment-total',
+           params=lambda fx: {'shipping_id': fx.shipping.id, 'coupon_name': 'BENCH10'},
+           user='buyer', queries=4),
+
+    Budget('api/cart/add-item', 'post', lambda fx: '/api/cart/add-item',
+           data=lambda fx: {'product_id': fx.outside_cart.id},
+           user='mutator', repeat=False, queries=13),
+    Budget('api/cart/update-item', 'put', lambda fx: '/api/cart/update-item',
+           data=lambda fx: {'product_id': fx.cart_products[1].id, 'count': 2},
+           user='mutator', repeat=False, queries=13),
+    Budget('api/cart/remove-item/<productId>', 'delete',
+           lambda fx: f'/api/cart/remove-item/{fx.cart_products[2].id}',
+           user='mutator', repeat=False, queries=13),
+    Budget('api/cart/SyncCart', 'put', lambda fx: '/api/cart/SyncCart',
+           data=lambda fx: {'cart_items': [
+               {'product': {'id': product.id}, 'count': 3} for product in fx.products[100:150]]},
+           user='mutator', status=201, repeat=False, queries=12),
+    Budget('api/cart/empty-cart', 'delete', lambda fx: '/api/cart/empty-cart',
+           user='mutator', repeat=False, queries=9),
+    Budget('api/wishlist/add-item', 'post', lambda fx: '/api/wishlist/add-item',
+           data=lambda fx: {'product_id': fx.outside_cart.id},
+           user='mutator', status=201, repeat=False, queries=12),
+    Budget('api/wishlist/remove-item/<int:productId>', 'delete',
+           lambda fx: f'/api/wishlist/remove-item/{fx.cart_products[3].id}',
+           user='mutator', repeat=False, queries=9),
+    Budget('api/reviews/create-review/<int:productId>', 'post',
+           lambda fx: f'/api/reviews/create-review/{fx.review_target.id}',
+           data=lambda fx: {'rating': 4.5, 'comment': 'Bench review'},
+           user='mutator', status=201, repeat=False, queries=14),
+    Budget('api/reviews/update-review/<int:productId>', 'put',
+           lambda fx: f'/api/reviews/update-review/{fx.edited_review_product.id}',
+           data=lambda fx: {'rating': 2, 'comment': 'Edited'},
+           user='mutator', repeat=False, queries=14),
+    Budget('api/reviews/delete-review/<int:productId>', 'delete',
+           lambda fx: f'/api/reviews/delete-review/{fx.edited_review_product.id}',
+           user='mutator', repeat=False, queries=8),
+    Budget('api/payment/make-payment', 'post', lambda fx: '/api/payment/make-payment',
+           data=checkout, user='buyer', repeat=False, queries=17, ms=500),
+    # Con quote_token no se vuelven a leer cupon ni envio
+    Budget('api/payment/make-payment', 'post', lambda fx: '/api/payment/make-payment',
+           data=checkout_with_quote, user='payer', repeat=False, queries=15, ms=500),
+]
+
+# URLconfs de terceros (admin, djoser) quedan fuera del presupuesto
+PROJECT_URLCONF_PREFIX = 'apps.'
+
+
+def project_routes():
+    """Every route declared in ``core/urls.py`` or an app's ``urls.py``."""
+    routes = set()
+
+    def walk(patterns, prefix, ours):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                module = getattr(pattern.urlconf_module, '__name__', '')
+                walk(pattern.url_patterns, prefix + str(pattern.pattern),
+                     module.startswith(PROJECT_URLCONF_PREFIX))
+            elif ours:
+                routes.add(prefix + str(pattern.pattern))
+
+    walk(get_resolver().url_patterns, '', True)
+    return routes
+
+
+def reset_caches():
+    cache.clear()
+    coupon_resolver.clear()
+
+
+def client_for(fx, user):
+    client = APIClient()
+    if user:
+        token = AccessToken.for_user(getattr(fx, user))
+        client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+    return client
+
+
+def prepare(budget, fx):
+    """``(path, params, data)`` of the request for ``budget``."""
+    params = budget.params(fx) if callable(budget.params) else budget.params
+    data = budget.data(fx) if budget.data else None
+    return budget.path(fx), params, data
+
+
+def send(client, budget, prepared):
+    path, params, data = prepared
+    if budget.method == 'get':
+        return client.get(path, params)
+    return getattr(client, budget.method)(path, data, format='json')
+
+
+def count_queries(budget, fx, run=None):
+    """``(response, queries, ms)`` of one cold-cache request for ``budget``.
+
+    Queries are counted with the same ``execute_wrapper`` the metrics middleware
+    uses (the ``CaptureQueriesContext`` log is reset by ``request_started``).
+    ``run`` wraps the request, e.g. to execute on-commit callbacks in a TestCase.
+    The request data is built before counting and timing (see ``prepare``).
+    """
+    client = client_for(fx, budget.user)
+    prepared = prepare(budget, fx)
+    reset_caches()
+    timer = QueryTimer()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        if run is not None:
+            stack.enter_context(run())
+        start = time.perf_counter()
+        response = send(client, budget, prepared)
+        ms = (time.perf_counter() - start) * 1000
+    return response, timer.count, ms
+
+
+def measure(budget, fx, repeat, run=None):
+    """``(response, queries, median ms)``; read-only routes are requested ``repeat`` times, all with a cold cache."""
+    response, queries, ms = count_queries(budget, fx, run)
+    timings = [ms]
+    if budget.repeat:
+        client = client_for(fx, budget.user)
+        prepared = prepare(budget, fx)
+        for _ in range(repeat - 1):
+            reset_caches()
+            start = time.perf_counter()
+            send(client, budget, prepared)
+            timings.append((time.perf_counter() - start) * 1000)
+    return response, queries, statistics.median(timings)
+
+
+def warm_up():
+    # Carga URLconf, middlewares y vistas antes de medir
+    APIClient().get('/api/orders/countries')
@@ -0,0 +1,125 @@
+"""Local stand-ins for the external services: an SMTP sink and an Imgur stub.
+
+    python -m bench.stubs [--smtp-port 2525] [--imgur-port 8025]
+
+Point the app at them with ``EMAIL_HOST=127.0.0.1 EMAIL_PORT=2525
+EMAIL_USE_TLS=False`` and ``IMAGE_UPLOAD_URL=http://127.0.0.1:8025/3/image``.
+"""
+import argparse
+import json
+import socketserver
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    # Lo minimo de RFC 5321 que usa smtplib: acepta todo y cuenta los mensajes
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 bench smtp sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-bench')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif command.startswith('AUTH'):
+                self.reply('235 accepted')
+            elif command == 'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                size = 0
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    size += len(data_line)
+                self.server.record(size)
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 ok')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, _SmtpHandler)
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+
+    def record(self, size):
+        with self.lock:
+            self.messages += 1
+            self.bytes += size
+
+
+class _ImgurHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        # Se descarta el cuerpo; la respuesta imita la de POST /3/image
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.record()
+        image_id = uuid.uuid4().hex[:7]
+        body = json.dumps({
+            'data': {'id': image_id, 'link': f'https://i.imgur.com/{image_id}.jpg'},
+            'success': True,
+            'status': 200,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ImgurStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, _ImgurHandler)
+        self.lock = threading.Lock()
+        self.uploads = 0
+
+    def record(self):
+        with self.lock:
+            self.uploads += 1
+
+
+def start(server):
+    """Serve ``server`` from a daemon thread and return it."""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--smtp-port', type=int, default=2525)
+    parser.add_argument('--imgur-port', type=int, default=8025)
+    args = parser.parse_args(argv)
+
+    smtp = start(SmtpSink((args.host, args.smtp_port)))
+    imgur = start(ImgurStub((args.host, args.imgur_port)))
+    print(f'SMTP sink on {args.host}:{args.smtp_port}, '
+          f'Imgur stub on http://{args.host}:{args.imgur_port}/3/image (Ctrl+C to stop)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f'\n{smtp.messages} emails received, {imgur.uploads} images uploaded')
+
+
+if __name__ == '__main__':
+    main()
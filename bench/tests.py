@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from . import fixtures
+from .routes import BUDGETS, LATENCY_SCALE, measure, project_routes, warm_up
+
+# Peticiones por ruta de solo lectura; se compara la mediana con el limite
+LATENCY_REPEAT = 3
+
+
+class RouteCoverageTest(TestCase):
+    def test_every_route_has_a_budget(self):
+        budgeted = {budget.route for budget in BUDGETS}
+        routes = project_routes()
+        self.assertEqual(sorted(routes - budgeted), [], 'routes without a budget')
+        self.assertEqual(sorted(budgeted - routes), [], 'budgets for routes that do not exist')
+
+
+class QueryBudgetTest(TestCase):
+    """Every route stays within its query and latency budget on the full bench catalog,
+    with carts and wishlists of ``cart_size`` items."""
+
+    cart_size = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fx = fixtures.seed(cart_size=cls.cart_size)
+        warm_up()
+
+    def test_routes(self):
+        # Un solo test: las mutaciones de cada usuario van despues de sus lecturas
+        for budget in BUDGETS:
+            with self.subTest(route=budget.route, method=budget.method):
+                response, queries, ms = measure(
+                    budget, self.fx, LATENCY_REPEAT,
+                    run=lambda: self.captureOnCommitCallbacks(execute=True))
+                self.assertEqual(response.status_code, budget.status)
+                self.assertLessEqual(queries, budget.queries)
+                self.assertLessEqual(ms, budget.ms * LATENCY_SCALE, 'median ms')
+
+
+class LargeCartQueryBudgetTest(QueryBudgetTest):
+    # Mismos limites con 10 veces mas items: ninguna ruta hace consultas por item
+    cart_size = 50
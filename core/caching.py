@@ -0,0 +1,14 @@
+from django.conf import settings
+
+
+def invalidated_timeout(timeout):
+    """Cache timeout for a value invalidated with ``cache.delete``.
+
+    ``timeout`` as is with a shared cache; with a per-process cache the other
+    workers never see the delete, so the value expires after ``LOCAL_CACHE_TIMEOUT``.
+    """
+    if settings.CACHE_SHARED:
+        return timeout
+    if timeout is None:
+        return settings.LOCAL_CACHE_TIMEOUT
+    return min(timeout, settings.LOCAL_CACHE_TIMEOUT)
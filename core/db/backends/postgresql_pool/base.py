@@ -0,0 +1,25 @@
+from django.db.backends.postgresql import base
+from django.utils.functional import cached_property
+
+from core.db.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend that borrows connections from a per-process pool.
+
+    Use with ``CONN_MAX_AGE = 0``: Django "closes" the connection at the end
+    of each request, which hands it back to the pool. Pool options go in
+    ``DATABASES[alias]['POOL']`` (see ``core.db.pool.DEFAULTS``).
+    """
+
+    @cached_property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL'))
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
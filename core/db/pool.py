@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+# Valores de connection.info.transaction_status (iguales en psycopg2 y psycopg 3)
+TRANSACTION_IDLE = 0
+TRANSACTION_UNKNOWN = 4
+
+DEFAULTS = {
+    # Conexiones abiertas a la vez por worker (libres + en uso)
+    'MAX_SIZE': 10,
+    # Segundos esperando una conexion libre antes de fallar
+    'TIMEOUT': 10.0,
+    # Las conexiones libres por mas de esto se verifican con SELECT 1 antes de reusarse
+    'CHECK_IDLE': 30.0,
+    # Se cierran (en vez de reusarse) pasado este tiempo desde que se abrieron
+    'MAX_LIFETIME': 1800.0,
+}
+
+
+class ConnectionPool:
+    """Per-process pool of DB-API connections, shared by the worker's threads."""
+
+    def __init__(self, options=None):
+        options = {**DEFAULTS, **(options or {})}
+        self.max_size = int(options['MAX_SIZE'])
+        self.timeout = float(options['TIMEOUT'])
+        self.check_idle = float(options['CHECK_IDLE'])
+        self.max_lifetime = float(options['MAX_LIFETIME'])
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        # (conexion, abierta_en, liberada_en)
+        self._idle = deque()
+        self._opened_at = {}
+        self.stats = {
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _discard(self, connection):
+        self._count('discarded')
+        with self._lock:
+            self._opened_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _usable(self, connection, opened_at, released_at):
+        now = time.monotonic()
+        if connection.closed or now - opened_at > self.max_lifetime:
+            return False
+        if now - released_at > self.check_idle:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                if connection.info.transaction_status != TRANSACTION_IDLE:
+                    connection.rollback()
+            except Exception:
+                return False
+        return True
+
+    def acquire(self, connect):
+        """Return an idle connection, or a new one from ``connect()`` while under ``max_size``."""
+        if not self._slots.acquire(blocking=False):
+            self._count('waits')
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count('timeouts')
+                raise OperationalError(
+                    f'Connection pool exhausted: {self.max_size} connections in use')
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    break
+                if self._usable(*entry):
+                    self._count('reused')
+                    return entry[0]
+                self._discard(entry[0])
+
+            connection = connect()
+            with self._lock:
+                self._opened_at[id(connection)] = time.monotonic()
+                self.stats['created'] += 1
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        """Give ``connection`` back, rolled back; broken connections are closed instead."""
+        try:
+            status = connection.info.transaction_status if not connection.closed else TRANSACTION_UNKNOWN
+            if status == TRANSACTION_UNKNOWN:
+                self._discard(connection)
+                return
+            if status != TRANSACTION_IDLE:
+                try:
+                    connection.rollback()
+                except Exception:
+                    self._discard(connection)
+                    return
+            with self._lock:
+                opened_at = self._opened_at.get(id(connection), time.monotonic())
+                self._idle.append((connection, opened_at, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            idle = len(self._idle)
+            open_connections = len(self._opened_at)
+            stats = dict(self.stats)
+        return {
+            'max_size': self.max_size,
+            'open': open_connections,
+            'idle': idle,
+            'in_use': open_connections - idle,
+            **stats,
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options=None):
+    # Por pid: tras un fork (gunicorn --preload) el hijo no comparte sockets con el padre
+    key = (os.getpid(), alias)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(options)
+        return _pools[key]
+
+
+def pool_stats():
+    """Snapshot of every pool of the current process, by database alias."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = {alias: pool for (owner, alias), pool in _pools.items() if owner == pid}
+    return {alias: pool.snapshot() for alias, pool in pools.items()}
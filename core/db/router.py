@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from core.stamps import get_stamps
+
+PIN_KEY = 'db:pin:{}'
+PIN_COOKIE = 'db_primary'
+
+# Base de lectura del request en curso (None = default) y si ya escribio algo
+_read_alias = ContextVar('read_alias', default=None)
+_wrote = ContextVar('wrote', default=False)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """Reads go to the replica chosen for the current request, writes to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las replicas tienen los mismos datos que default
+        return True
+
+
+def replica_lag(connection):
+    """Seconds the replica is behind its primary (0 for a primary or non-PostgreSQL)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Sin WAL pendiente no hay retraso aunque la ultima transaccion sea vieja
+            cursor.execute(
+                'SELECT CASE WHEN NOT pg_is_in_recovery() '
+                'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END')
+        else:
+            cursor.execute('SELECT 0')
+        return float(cursor.fetchone()[0])
+
+
+def is_healthy(alias):
+    # Resultado cacheado por worker durante REPLICA_CHECK_INTERVAL segundos
+    now = time.monotonic()
+    with _health_lock:
+        checked_at, healthy = _health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.REPLICA_CHECK_INTERVAL:
+        return healthy
+
+    try:
+        healthy = replica_lag(connections[alias]) <= settings.REPLICA_MAX_LAG
+    except DatabaseError:
+        healthy = False
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def pin_to_primary(request, response):
+    """Send ``request``'s client to the primary for ``REPLICA_PIN_SECONDS``.
+
+    The pin travels in a signed cookie, so any worker honours it, and is also
+    kept in the cache under the user for clients that do not send cookies
+    back (reliable only when ``CACHE_SHARED``).
+    """
+    response.set_signed_cookie(
+        PIN_COOKIE, '1', salt=PIN_COOKIE, max_age=settings.REPLICA_PIN_SECONDS,
+        secure=request.is_secure(), httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(PIN_KEY.format(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request):
+    if request.get_signed_cookie(
+            PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=settings.REPLICA_PIN_SECONDS):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and bool(cache.get(PIN_KEY.format(user.pk)))
+
+
+def choose_read_alias(request, tables):
+    """A healthy replica for ``request``'s reads of ``tables``, or ``None`` to stay on ``default``."""
+    replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+    # Sin sellos no hay como saber si las replicas ya tienen el ultimo cambio
+    if not replicas or not tables:
+        return None
+    # Quien acaba de escribir lee del primario para ver su propio cambio
+    if is_pinned(request) or recently_changed(tables):
+        return None
+    healthy = [alias for alias in replicas if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+def recently_changed(tables):
+    """Whether ``tables`` may have changed after the replicas' data (or it is unknown)."""
+    stamps = get_stamps(tables)
+    if stamps is None:
+        return True
+    return time.time() - max(stamps) / 1_000_000_000 <= settings.REPLICA_MAX_LAG + 1
+
+
+def route_reads(alias):
+    # Lecturas del resto del request; ReplicaMiddleware lo deshace al terminar
+    _read_alias.set(alias)
+
+
+def start_request():
+    return _read_alias.set(None), _wrote.set(False)
+
+
+def finish_request(tokens):
+    """Undo ``start_request``; returns whether the request wrote to the database."""
+    read_token, wrote_token = tokens
+    wrote = _wrote.get()
+    _read_alias.reset(read_token)
+    _wrote.reset(wrote_token)
+    return wrote
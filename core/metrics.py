@@ -0,0 +1,56 @@
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+PERCENTILES = (50, 95, 99)
+
+
+def _percentile(ordered, percent):
+    # Rango mas cercano sobre una lista ya ordenada
+    index = max(0, min(len(ordered) - 1, -(-len(ordered) * percent // 100) - 1))
+    return ordered[index]
+
+
+class RollingMetrics:
+    """Last ``window`` samples of every URL name, kept per process."""
+
+    FIELDS = ('total', 'db', 'render', 'queries')
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._seen = defaultdict(int)
+
+    def record(self, url_name, sample):
+        """Store ``sample`` and return how many samples ``url_name`` has seen so far."""
+        with self._lock:
+            self._samples[url_name].append(tuple(sample[field] for field in self.FIELDS))
+            self._seen[url_name] += 1
+            return self._seen[url_name]
+
+    def percentiles(self, url_name):
+        with self._lock:
+            samples = list(self._samples.get(url_name, ()))
+        if not samples:
+            return None
+        summary = {'count': len(samples)}
+        for index, field in enumerate(self.FIELDS):
+            ordered = sorted(sample[index] for sample in samples)
+            for percent in PERCENTILES:
+                summary[f'{field}_p{percent}'] = round(_percentile(ordered, percent), 2)
+        return summary
+
+    def snapshot(self):
+        with self._lock:
+            url_names = list(self._samples)
+        return {url_name: self.percentiles(url_name) for url_name in sorted(url_names)}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._seen.clear()
+
+
+rolling = RollingMetrics(getattr(settings, 'METRICS_WINDOW', 500))
@@ -0,0 +1,124 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .db.router import finish_request, pin_to_primary, start_request
+from .metrics import rolling
+
+logger = logging.getLogger('core.metrics')
+
+
+class QueryTimer:
+    """``execute_wrapper`` that counts queries and adds up their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """Sample requests and report query count, DB, render and wall time.
+
+    Sampled responses get a ``Server-Timing`` header, a JSON line on the
+    ``core.metrics`` logger and a sample in the rolling per-URL percentiles.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 0.0)
+        self.summary_every = getattr(settings, 'METRICS_SUMMARY_EVERY', 0)
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        request._metrics_render = 0.0
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        self.report(request, response, timer, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # Las respuestas de DRF se renderizan (JSON) despues de la vista
+        if hasattr(request, '_metrics_render'):
+            render_start = time.perf_counter()
+
+            def rendered(response):
+                request._metrics_render += time.perf_counter() - render_start
+            response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, timer, total):
+        match = request.resolver_match
+        url_name = (match.url_name or match.route) if match else 'unresolved'
+        sample = {
+            'total': total * 1000,
+            'db': timer.duration * 1000,
+            'render': request._metrics_render * 1000,
+            'queries': timer.count,
+        }
+
+        response['Server-Timing'] = ', '.join([
+            'db;dur=%.1f;desc="%d queries"' % (sample['db'], timer.count),
+            'render;dur=%.1f' % sample['render'],
+            'total;dur=%.1f' % sample['total'],
+        ])
+
+        seen = rolling.record(url_name, sample)
+        logger.info(json.dumps({
+            'event': 'request',
+            'url_name': url_name,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': timer.count,
+            'db_ms': round(sample['db'], 2),
+            'render_ms': round(sample['render'], 2),
+            'total_ms': round(sample['total'], 2),
+        }))
+        if self.summary_every and seen % self.summary_every == 0:
+            logger.info(json.dumps({
+                'event': 'summary',
+                'url_name': url_name,
+                **rolling.percentiles(url_name),
+            }))
+
+
+class ReplicaMiddleware:
+    """Scope replica routing to one request and pin clients that wrote to the primary.
+
+    Views opt in to replica reads (``CustomAPIView.replica_reads``); any
+    request that writes, through any view or the admin, pins its client for
+    ``REPLICA_PIN_SECONDS`` so it reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tokens = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = finish_request(tokens)
+        if wrote and getattr(settings, 'DATABASE_REPLICAS', ()):
+            pin_to_primary(request, response)
+        return response
@@ -0,0 +1,80 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder trunca a milisegundos, el cursor necesita el valor exacto
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_page_size(limit, default=DEFAULT_PAGE_SIZE):
+    if limit in (None, ''):
+        return default
+    limit = int(limit)
+    if limit < 1:
+        raise ValueError('Limit must be a positive integer')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+class KeysetPaginator:
+    """Cursor (keyset) pagination over ``ordering``, which must end in a unique field."""
+
+    def __init__(self, ordering, page_size=DEFAULT_PAGE_SIZE):
+        self.ordering = list(ordering)
+        self.page_size = page_size
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field) for field in self.fields]
+        payload = json.dumps(
+            {'o': self.ordering, 'v': values}, cls=CursorEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (AttributeError, ValueError, binascii.Error):
+            raise InvalidCursor('Invalid cursor')
+        if not isinstance(payload, dict) or payload.get('o') != self.ordering \
+                or len(payload.get('v') or []) != len(self.fields):
+            raise InvalidCursor('Invalid cursor')
+        return payload['v']
+
+    def _after(self, values):
+        # (a, b, c) > (x, y, z) respetando la direccion de cada columna
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = self.fields[index]
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            branch = Q(**{f'{name}__{lookup}': values[index]})
+            for previous, value in zip(self.fields[:index], values[:index]):
+                branch &= Q(**{previous: value})
+            condition |= branch
+        return condition
+
+    def paginate(self, queryset, cursor=None):
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+
+        page = list(queryset[:self.page_size + 1])
+        next_cursor = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            next_cursor = self.encode_cursor(page[-1])
+        return page, next_cursor
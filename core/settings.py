@@ -10,6 +10,7 @@ from pathlib import Path
 from datetime import timedelta
 import dj_database_url
 import os
+import tempfile
 import environ
 # import logging
 
@@ -66,6 +67,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 ECOMMERCE_APPS = []
@@ -74,11 +76,13 @@ THIRD_APPS = ['rest_framework', 'djoser', 'corsheaders',
               'rest_framework_simplejwt', 'rest_framework_simplejwt.token_blacklist', "rest_framework.authtoken", 'social_django', 'drf_spectacular',]
 
 PROJECT_APPS = ['apps.user', 'apps.category',
-                'apps.product', 'apps.cart', 'apps.shipping', 'apps.orders', 'apps.payment', 'apps.coupons', 'apps.wishlist', 'apps.reviews']
+                'apps.product', 'apps.cart', 'apps.shipping', 'apps.orders', 'apps.payment', 'apps.coupons', 'apps.wishlist', 'apps.reviews', 'apps.notifications']
 
 INSTALLED_APPS = DJANGO_APPS + PROJECT_APPS + ECOMMERCE_APPS + THIRD_APPS
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo total incluya al resto de middlewares
+    'core.middleware.RequestMetricsMiddleware',
     'social_django.middleware.SocialAuthExceptionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -87,6 +91,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Despues de la autenticacion: fija al primario a quien escribio
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware'
@@ -119,10 +125,69 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_POOL: pool de conexiones por worker (solo PostgreSQL, ver core/db/pool.py).
+# Sin pool, DB_CONN_MAX_AGE mantiene la conexion abierta entre requests.
+# DB_PGBOUNCER: detras de PgBouncer en modo transaction no hay cursores del lado del servidor.
+DB_POOL = env.bool('DB_POOL', default=False)
+
+
+def database_config(url, **options):
+    config = dj_database_url.parse(
+        url,
+        # Con pool Django cierra al final de cada request y la conexion vuelve al pool
+        conn_max_age=0 if DB_POOL else env.int('DB_CONN_MAX_AGE', default=600),
+        conn_health_checks=env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+        disable_server_side_cursors=env.bool('DB_PGBOUNCER', default=False),
+        **options,
+    )
+    if DB_POOL and config['ENGINE'] == 'django.db.backends.postgresql':
+        config['ENGINE'] = 'core.db.backends.postgresql_pool'
+        config['POOL'] = {
+            'MAX_SIZE': env.int('DB_POOL_MAX_SIZE', default=10),
+            'TIMEOUT': env.float('DB_POOL_TIMEOUT', default=10.0),
+            'CHECK_IDLE': env.float('DB_POOL_CHECK_IDLE', default=30.0),
+            'MAX_LIFETIME': env.float('DB_POOL_MAX_LIFETIME', default=1800.0),
+        }
+    return config
+
+
 DATABASES = {
-    'default': dj_database_url.parse(env("DEPLOY_DATABASE_URL"))
+    'default': database_config(env("DEPLOY_DATABASE_URL"))
+}
+
+# Replicas de lectura (URLs separadas por comas) para las vistas con replica_reads;
+# en tests apuntan a la base de default
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(env.list('DEPLOY_REPLICA_URLS', default=[]), 1):
+    DATABASES[f'replica{index}'] = database_config(replica_url, test_options={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['core.db.router.ReplicaRouter']
+
+# Segundos que un cliente lee del primario despues de escribir (cookie firmada, y
+# en la cache por usuario para clientes sin cookies: requiere CACHE_SHARED)
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
+# Una replica con mas retraso que esto (segundos) deja de recibir lecturas
+REPLICA_MAX_LAG = env.float('REPLICA_MAX_LAG', default=5.0)
+# Cada cuantos segundos cada worker vuelve a medir el retraso de una replica
+REPLICA_CHECK_INTERVAL = env.float('REPLICA_CHECK_INTERVAL', default=5.0)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Memoria local por defecto; con varios workers usar un backend compartido,
+# p. ej. CACHE_URL=redis://localhost:6379/0
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
 }
 
+# Con una cache por proceso (locmem) un delete solo llega al worker que lo hace:
+# los valores que se invalidan borrandolos caducan entonces a los LOCAL_CACHE_TIMEOUT segundos
+CACHE_SHARED = env.bool('CACHE_SHARED', default=not CACHES['default']['BACKEND'].endswith(
+    ('LocMemCache', 'DummyCache')))
+LOCAL_CACHE_TIMEOUT = env.int('LOCAL_CACHE_TIMEOUT', default=30)
+
 CORS_ORIGIN_WHITELIST = os.environ.get('CORS_URLS').split(" ")
 
 CSRF_TRUSTED_ORIGINS = os.environ.get('CORS_URLS').split(" ")
@@ -245,6 +310,47 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Subida de imagenes de productos (Imgur por defecto; apuntar a un stub local en pruebas)
+IMAGE_UPLOAD_URL = env('IMAGE_UPLOAD_URL', default='https://api.imgur.com/3/image')
+# (conexion, lectura) en segundos
+IMAGE_UPLOAD_TIMEOUT = (env.float('IMAGE_UPLOAD_CONNECT_TIMEOUT', default=5.0),
+                        env.float('IMAGE_UPLOAD_READ_TIMEOUT', default=30.0))
+IMAGE_UPLOAD_SPOOL_DIR = env('IMAGE_UPLOAD_SPOOL_DIR', default=os.path.join(
+    tempfile.gettempdir(), 'product-photos'))
+
+# Segundos que cada worker mantiene en memoria un cupon resuelto (o su ausencia)
+COUPON_CACHE_TTL = env.int('COUPON_CACHE_TTL', default=60)
+
+# Fraccion de requests medidos por core.middleware.RequestMetricsMiddleware (0 lo apaga)
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', default=0.1)
+# Muestras por URL para los percentiles moviles de cada worker
+METRICS_WINDOW = env.int('METRICS_WINDOW', default=500)
+# Cada cuantas muestras de una URL se registran sus percentiles (0 nunca)
+METRICS_SUMMARY_EVERY = env.int('METRICS_SUMMARY_EVERY', default=100)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'metrics': {
+            'format': '%(asctime)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'metrics',
+        },
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['metrics'],
+            'level': env('METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -256,9 +362,13 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 if not DEBUG:
     DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
-    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    # Los correos de checkout salen por la cola (manage.py send_queued_emails);
+    # para pruebas locales usar p. ej. django.core.mail.backends.locmem.EmailBackend
+    EMAIL_BACKEND = env(
+        'EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
     EMAIL_HOST = env('EMAIL_HOST')
     EMAIL_HOST_USER = env('EMAIL_HOST_USER')
     EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
     EMAIL_PORT = env('EMAIL_PORT')
-    EMAIL_USE_TLS = True
+    # False para servidores SMTP locales sin TLS (p. ej. el sink de bench.stubs)
+    EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=True)
@@ -0,0 +1,50 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .caching import invalidated_timeout
+
+KEY_PREFIX = 'stamp:'
+
+
+def _key(table):
+    return KEY_PREFIX + table
+
+
+def touch_stamp(*tables):
+    """Mark ``tables`` as changed once the current transaction commits."""
+    def touch():
+        now = time.time_ns()
+        cache.set_many({_key(table): now for table in tables}, invalidated_timeout(None))
+    transaction.on_commit(touch)
+
+
+def get_stamps(tables):
+    """Change stamp (nanoseconds) of each table, or ``None`` when any is unknown.
+
+    An unknown stamp (never set, evicted or expired) starts at now for the
+    next request; until then nothing built from ``tables`` can be validated.
+    """
+    keys = [_key(table) for table in tables]
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, invalidated_timeout(None))
+        return None
+    return [stamps[key] for key in keys]
+
+
+def stamp_validators(tables):
+    """``(etag, last_modified)`` for a response built only from ``tables``, or ``None``."""
+    stamps = get_stamps(tables)
+    if stamps is None:
+        # Sin sello no se sabe si la ETag del cliente sigue valida: nunca responder 304
+        return None
+    digest = hashlib.sha1(
+        '|'.join(f'{table}:{stamp}' for table, stamp in zip(tables, stamps)).encode()
+    ).hexdigest()[:20]
+    return f'"{digest}"', max(stamps) // 1_000_000_000
@@ -1,8 +1,21 @@
+import os
 from datetime import datetime
+from django.db import connections
 from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from drf_spectacular.openapi import AutoSchema
+from drf_spectacular.utils import extend_schema
+
+from .db.pool import pool_stats
+from .db.router import choose_read_alias, route_reads
+from .metrics import rolling
+from .stamps import stamp_validators
+
+CACHEABLE_METHODS = ('GET', 'HEAD')
 
 
 class CustomAutoSchema(AutoSchema):
@@ -14,8 +27,63 @@ class CustomAutoSchema(AutoSchema):
         return super().get_operation_security(path, method)
 
 
+class NotModified(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
 class CustomAPIView(APIView):
     permission_classes = [AllowAny]
+    # Argumentos de patch_cache_control, p. ej. {'public': True, 'max_age': 60}
+    cache_control = None
+    # Tablas cuyo sello de cambios define la ETag/Last-Modified de la respuesta
+    cache_stamps = ()
+    # Vista de solo lectura: sus consultas pueden ir a una replica (ver core.db.router)
+    replica_reads = False
+    # Tablas que, si cambiaron hace poco, obligan a leer del primario (por defecto cache_stamps)
+    replica_stamps = None
+
+    def get_cache_validators(self, request, *args, **kwargs):
+        """``(etag, last_modified)`` of the current GET, or ``None`` when it is not cacheable."""
+        if not self.cache_stamps:
+            return None
+        return stamp_validators(self.cache_stamps)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.cache_validators = None
+        if request.method in CACHEABLE_METHODS:
+            self.cache_validators = self.get_cache_validators(request, *args, **kwargs)
+        if self.cache_validators:
+            # Responder 304 antes de ejecutar el handler (sin consultas ni serializacion)
+            etag, last_modified = self.cache_validators
+            conditional = get_conditional_response(
+                request._request, etag=etag, last_modified=last_modified)
+            if conditional is not None:
+                raise NotModified(conditional.status_code)
+
+        # La autenticacion ya leyo del primario; desde aqui aplica el router
+        if self.replica_reads:
+            stamps = self.replica_stamps if self.replica_stamps is not None else self.cache_stamps
+            route_reads(choose_read_alias(request, stamps))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=exc.status_code)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in CACHEABLE_METHODS and response.status_code in (200, 304):
+            if self.cache_control:
+                patch_cache_control(response, **self.cache_control)
+            validators = getattr(self, 'cache_validators', None)
+            if validators:
+                etag, last_modified = validators
+                response.headers.setdefault('ETag', etag)
+                if last_modified is not None:
+                    response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
 
     @staticmethod
     def get_500_errors():
@@ -54,4 +122,25 @@ class AuthenticatedAPIView(CustomAPIView):
 def ping_view(request):
     hora_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"✅ Ping recibido a {hora_actual}")
-    return JsonResponse({"message": "ok"}, status=200)
+    # Estado de las conexiones de este worker; no consulta la base
+    pools = pool_stats()
+    databases = {}
+    for alias in connections:
+        settings_dict = connections.settings[alias]
+        databases[alias] = {
+            'engine': settings_dict['ENGINE'],
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0),
+            'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+            'connected': connections[alias].connection is not None,
+            'pool': pools.get(alias),
+        }
+    return JsonResponse({"message": "ok", "pid": os.getpid(), "databases": databases}, status=200)
+
+
+class MetricsView(CustomAPIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(exclude=True)
+    def get(self, request, format=None):
+        # Percentiles moviles del worker que atiende la peticion
+        return Response({'metrics': rolling.snapshot()})